@@ -0,0 +1,32 @@
+from hashlib import md5
+
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+
+from cinema_app import versions
+
+
+class ConditionalGetMixin:
+    version_name = None
+
+    def get_etag(self, request):
+        token = versions.get_version(self.version_name)
+        resource = md5(request.get_full_path().encode()).hexdigest()[:16]
+        return f'"{self.version_name}-{token}-{resource}"'
+
+    def not_modified(self, request):
+        self.etag = self.get_etag(request)
+        return get_conditional_response(request, etag=self.etag)
+
+    def list(self, request, *args, **kwargs):
+        return self.not_modified(request) or super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return self.not_modified(request) or Response(self.get_serializer(instance).data)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'etag', None) and response.status_code in (200, 304):
+            response['ETag'] = self.etag
+        return response
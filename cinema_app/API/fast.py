@@ -0,0 +1,79 @@
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601
+
+
+class FastPathUnavailable(Exception):
+    pass
+
+
+def _iso_format(field):
+    if getattr(field, 'format', ISO_8601) not in (None, ISO_8601):
+        raise FastPathUnavailable(f'{field.field_name} uses a custom format')
+    return lambda value: value.isoformat()
+
+
+def _encoder(field):
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        return None
+    if isinstance(field, serializers.IntegerField):
+        return int
+    if isinstance(field, serializers.CharField):
+        return str
+    if isinstance(field, serializers.DateTimeField):
+        raise FastPathUnavailable(f'{field.field_name} is a datetime')
+    if isinstance(field, (serializers.DateField, serializers.TimeField)):
+        return _iso_format(field)
+    raise FastPathUnavailable(f'{field.field_name} is a {type(field).__name__}')
+
+
+class FastSerializer:
+    def __init__(self, serializer_class):
+        self.columns = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if '.' in field.source or field.source == '*':
+                raise FastPathUnavailable(f'{name} reads a nested source')
+            self.columns.append((name, field.source, _encoder(field)))
+        self.sources = [source for _, source, _ in self.columns]
+
+    def values(self, queryset, *extra_sources):
+        return queryset.values(*self.sources, *(source for source in extra_sources if source not in self.sources))
+
+    def to_representation(self, rows):
+        columns = self.columns
+        return [
+            {
+                name: row[source] if encoder is None or row[source] is None else encoder(row[source])
+                for name, source, encoder in columns
+            }
+            for row in rows
+        ]
+
+
+class FastListMixin:
+    fast_list = True
+    _fast_serializers = {}
+
+    def get_fast_serializer(self):
+        serializer_class = self.get_serializer_class()
+        if serializer_class not in self._fast_serializers:
+            try:
+                self._fast_serializers[serializer_class] = FastSerializer(serializer_class)
+            except FastPathUnavailable:
+                self._fast_serializers[serializer_class] = None
+        return self._fast_serializers[serializer_class]
+
+    def list(self, request, *args, **kwargs):
+        fast_serializer = self.get_fast_serializer() if self.fast_list else None
+        if fast_serializer is None or request.method not in SAFE_METHODS:
+            return super().list(request, *args, **kwargs)
+
+        ordering = (field.lstrip('-') for field in getattr(self, 'keyset_ordering', ()))
+        rows = fast_serializer.values(self.filter_queryset(self.get_queryset()), *ordering)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(fast_serializer.to_representation(page))
+        return Response(fast_serializer.to_representation(rows))
@@ -0,0 +1,72 @@
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+SESSION_ORDERINGS = {
+    'date': ('date', 'time_start', 'id'),
+    '-date': ('-date', '-time_start', '-id'),
+    'price': ('price', 'date', 'time_start', 'id'),
+    '-price': ('-price', 'date', 'time_start', 'id'),
+    'rest_of_seats': ('rest_of_seats', 'date', 'time_start', 'id'),
+    '-rest_of_seats': ('-rest_of_seats', 'date', 'time_start', 'id'),
+}
+
+
+def session_ordering(request):
+    ordering = request.query_params.get('ordering') or 'date'
+    if ordering not in SESSION_ORDERINGS:
+        raise ValidationError({'ordering': [f'Choose one of: {", ".join(SESSION_ORDERINGS)}.']})
+    return SESSION_ORDERINGS[ordering]
+
+
+class SessionFilterBackend(BaseFilterBackend):
+    filters = {
+        'date_from': ('date__gte', serializers.DateField()),
+        'date_to': ('date__lte', serializers.DateField()),
+        'film': ('film_id', serializers.IntegerField(min_value=1)),
+        'hall': ('hall_id', serializers.IntegerField(min_value=1)),
+        'min_seats': ('rest_of_seats__gte', serializers.IntegerField(min_value=0)),
+        'price_min': ('price__gte', serializers.IntegerField(min_value=0)),
+        'price_max': ('price__lte', serializers.IntegerField(min_value=0)),
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        lookups, errors = {}, {}
+
+        for param, (lookup, field) in self.filters.items():
+            value = request.query_params.get(param)
+            if value in (None, ''):
+                continue
+            try:
+                lookups[lookup] = field.run_validation(value)
+            except ValidationError as error:
+                errors[param] = error.detail
+
+        if errors:
+            raise ValidationError(errors)
+        return queryset.filter(**lookups)
+
+
+class SessionStatsFilterBackend(SessionFilterBackend):
+    filters = {
+        'date_from': ('session__date__gte', serializers.DateField()),
+        'date_to': ('session__date__lte', serializers.DateField()),
+        'film': ('session__film_id', serializers.IntegerField(min_value=1)),
+        'hall': ('session__hall_id', serializers.IntegerField(min_value=1)),
+    }
+
+
+class FilmDayStatsFilterBackend(SessionFilterBackend):
+    filters = {
+        'date_from': ('date__gte', serializers.DateField()),
+        'date_to': ('date__lte', serializers.DateField()),
+        'film': ('film_id', serializers.IntegerField(min_value=1)),
+    }
+
+
+class HallDayStatsFilterBackend(SessionFilterBackend):
+    filters = {
+        'date_from': ('date__gte', serializers.DateField()),
+        'date_to': ('date__lte', serializers.DateField()),
+        'hall': ('hall_id', serializers.IntegerField(min_value=1)),
+    }
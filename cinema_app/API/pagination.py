@@ -0,0 +1,112 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    ordering = ('id',)
+    page_size = api_settings.PAGE_SIZE or 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+
+    def get_ordering(self, view):
+        return getattr(view, 'keyset_ordering', self.ordering)
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param, '')
+        if value.isdigit() and int(value) > 0:
+            return min(int(value), self.max_page_size)
+        return self.page_size
+
+    def encode_cursor(self, values):
+        return urlsafe_b64encode(json.dumps(values, cls=DjangoJSONEncoder).encode()).decode()
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(cursor.encode()))
+        except ValueError:
+            raise NotFound('Invalid cursor')
+        if not isinstance(values, list) or len(values) != len(self.ordering_fields):
+            raise NotFound('Invalid cursor')
+        return values
+
+    def beyond(self, field, descending, nullable, value):
+        if value is None:
+            return Q(**{f'{field}__isnull': False}) if descending else Q(pk__in=[])
+        step = Q(**{f'{field}__lt' if descending else f'{field}__gt': value})
+        return step | Q(**{f'{field}__isnull': True}) if nullable and not descending else step
+
+    def same(self, field, value):
+        return Q(**{f'{field}__isnull': True}) if value is None else Q(**{field: value})
+
+    def after(self, values):
+        condition = Q()
+        for position in reversed(range(len(self.ordering_fields))):
+            field, descending, nullable = self.ordering_fields[position]
+            step = self.beyond(field, descending, nullable, values[position])
+            condition = step | self.same(field, values[position]) & condition if condition else step
+
+        field, descending, nullable = self.ordering_fields[0]
+        return (self.beyond(field, descending, nullable, values[0]) | self.same(field, values[0])) & condition
+
+    def order_by(self, field, descending, nullable):
+        if not nullable:
+            return f'-{field}' if descending else field
+        return F(field).desc(nulls_first=True) if descending else F(field).asc(nulls_last=True)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        fields = queryset.model._meta
+        self.ordering_fields = [
+            (field.lstrip('-'), field.startswith('-'), fields.get_field(field.lstrip('-')).null)
+            for field in self.get_ordering(view)
+        ]
+
+        queryset = queryset.order_by(*(self.order_by(*ordering_field) for ordering_field in self.ordering_fields))
+        values = self.decode_cursor(request)
+        if values is not None:
+            queryset = queryset.filter(self.after(values))
+
+        page_size = self.get_page_size(request)
+        rows = list(queryset[:page_size + 1])
+        self.next_values = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            self.next_values = [
+                last[field] if isinstance(last, dict) else getattr(last, field) for field, _, _ in self.ordering_fields
+            ]
+        return rows
+
+    def get_next_link(self):
+        if self.next_values is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_values))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
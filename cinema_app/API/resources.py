@@ -1,78 +1,92 @@
-from datetime import timedelta
+import io
 
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
-from rest_framework.viewsets import ModelViewSet
-
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+
+from cinema_app.API.conditional import ConditionalGetMixin
+from cinema_app.API.fast import FastListMixin
+from cinema_app.API.filters import SessionFilterBackend, SessionStatsFilterBackend, FilmDayStatsFilterBackend, \
+    HallDayStatsFilterBackend, session_ordering
 from cinema_app.API.permissions import IsOwnerOrAdminOrReadOnly, IsAdminOrReadOnly
-from cinema_app.API.serializers import UserRegistrationSerializer, HallSerializer, FilmSerializer, SessionSerializer, PurchaseSerializer
-from cinema_app.models import User, Hall, Film, Session, Purchase
+from cinema_app.API.serializers import UserRegistrationSerializer, HallSerializer, FilmSerializer, SessionSerializer, PurchaseSerializer, \
+    SeatHoldSerializer, GroupPurchaseSerializer, SalesExportSerializer, SessionStatsSerializer, FilmDayStatsSerializer, \
+    HallDayStatsSerializer
+from cinema_app.exports import CONTENT_TYPES, export_sales
+from cinema_app.importer import FORMATS, detect_format, import_schedule
+from cinema_app.ledger import with_pending_spent
+from cinema_app.middlewares import recent_slow_requests
+from cinema_app.pooling import metrics as pool_metrics
+from cinema_app.models import User, Hall, Film, Session, Purchase, SeatHold, SessionStats, FilmDayStats, HallDayStats
+from cinema_app.purchases import buy_tickets, buy_group, hold_seats, confirm_hold, release_hold, SoldOut, HoldExpired
+from cinema_app.recurrence import create_sessions
 
 
 class UserRegistrationView(ModelViewSet):
     permission_classes = [IsOwnerOrAdminOrReadOnly]
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
+    keyset_ordering = ('id',)
 
     def get_queryset(self):
         if self.request.user.is_authenticated:
             if self.request.user.is_superuser:
-                return User.objects.all()
+                return with_pending_spent(User.objects.all())
             else:
-                return User.objects.filter(username=self.request.user)
+                return with_pending_spent(User.objects.filter(pk=self.request.user.pk))
         else:
-            return None
+            return User.objects.none()
 
 
-class HallModelViewSet(ModelViewSet):
+class HallModelViewSet(ConditionalGetMixin, FastListMixin, ModelViewSet):
     permission_classes = [IsAdminUser]
     queryset = Hall.objects.all()
     serializer_class = HallSerializer
+    keyset_ordering = ('id',)
+    version_name = 'hall'
 
 
-class FilmModelViewSet(ModelViewSet):
+class FilmModelViewSet(ConditionalGetMixin, FastListMixin, ModelViewSet):
     permission_classes = [IsAdminOrReadOnly]
     queryset = Film.objects.all()
     serializer_class = FilmSerializer
+    keyset_ordering = ('id',)
+    version_name = 'film'
 
 
-class SessionModelViewSet(ModelViewSet):
+class SessionModelViewSet(ConditionalGetMixin, FastListMixin, ModelViewSet):
     queryset = Session.objects.all()
     serializer_class = SessionSerializer
     permission_classes = [IsAdminOrReadOnly]
+    filter_backends = [SessionFilterBackend]
+    version_name = 'session'
 
-    def perform_create(self, serializer):
-        session = serializer.validated_data
-
-        if Session.objects.filter(
-                date=session['date'],
-                time_start=session['time_start'],
-                time_end=session['time_end'],
-                price=session['price'],
-                hall=session['hall'],
-                film=session['film']
-        ).exists():
-            raise ValidationError("Session with the same attributes already exists.")
-
-        obj = serializer.save()
-        date_start = obj.film.date_start
-        date_finish = obj.film.date_finish
-
-        delta = timedelta(days=1)
-        date = date_start
-        while date <= date_finish:
-            session = Session(
-                date=date,
-                time_start=obj.time_start,
-                time_end=obj.time_end,
-                price=obj.price,
-                rest_of_seats=serializer.validated_data.get('rest_of_seats'),
-                hall=obj.hall,
-                film=obj.film
-            )
-            session.save()
-            date += delta
+    @property
+    def keyset_ordering(self):
+        return session_ordering(self.request)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            summary = create_sessions(serializer.schedule_rule)
+        except IntegrityError:
+            raise ValidationError('This session conflicts with an existing session.')
+        return Response(summary, status=status.HTTP_201_CREATED)
+
+    @action(detail=True)
+    def seats(self, request, pk=None):
+        amount = request.query_params.get('amount', '')
+        data = self.get_object().get_seat_map().availability(int(amount) if amount.isdigit() else None)
+        return Response(data)
 
     def perform_update(self, serializer):
         session = self.get_object()
@@ -80,35 +94,151 @@ class SessionModelViewSet(ModelViewSet):
         if session.purchase_set.exists():
             raise ValidationError("Cannot update session with purchased tickets.")
 
-        serializer.save()
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError('This session conflicts with an existing session.')
 
 
 class PurchaseModelViewSet(ModelViewSet):
     serializer_class = PurchaseSerializer
     queryset = Purchase.objects.all()
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-id',)
 
     def get_queryset(self):
         if self.request.user.is_authenticated:
             if self.request.user.is_superuser:
                 return Purchase.objects.all()
             else:
-                return Purchase.objects.filter(author=self.request.user)
+                return Purchase.objects.filter(buyer=self.request.user)
         else:
             return Purchase.objects.all()
 
     def perform_create(self, serializer):
-        session_id = self.kwargs['session_id']
-        session = Session.objects.get(pk=session_id)
-        buyer = self.request.user
+        session = Session.objects.get(pk=self.kwargs['session_id'])
+
+        try:
+            serializer.instance = buy_tickets(
+                session, self.request.user, serializer.validated_data['amount'], serializer.validated_data['seats']
+            )
+        except SoldOut as error:
+            raise ValidationError(str(error))
+
+
+class SeatHoldModelViewSet(ModelViewSet):
+    serializer_class = SeatHoldSerializer
+    queryset = SeatHold.objects.all()
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'post', 'delete']
+    keyset_ordering = ('expires_at', 'id')
+
+    def get_queryset(self):
+        return SeatHold.objects.filter(buyer=self.request.user, session_id=self.kwargs['session_id'])
+
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+
+        try:
+            serializer.instance = hold_seats(data['session'], self.request.user, data['amount'], data['seats'])
+        except SoldOut as error:
+            raise ValidationError(str(error))
+
+    def perform_destroy(self, instance):
+        release_hold(instance)
+
+    @action(detail=True, methods=['post'])
+    def confirm(self, request, session_id=None, pk=None):
+        try:
+            purchase = confirm_hold(self.get_object())
+        except HoldExpired as error:
+            raise ValidationError(str(error))
+        return Response(PurchaseSerializer(purchase).data, status=status.HTTP_201_CREATED)
 
-        amount = serializer.validated_data['amount']
-        total_money = session.price * amount
 
-        buyer.total_spent += total_money
-        session.rest_of_seats -= amount
+class GroupPurchaseView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = GroupPurchaseSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        lines = [(line['session'], line['amount'], line['seats']) for line in serializer.validated_data['lines']]
+        try:
+            purchases = buy_group(request.user, lines)
+        except SoldOut as error:
+            raise ValidationError(str(error))
+        return Response(PurchaseSerializer(purchases, many=True).data, status=status.HTTP_201_CREATED)
+
+
+class SlowRequestView(APIView):
+    permission_classes = [IsAdminUser]
 
-        with transaction.atomic():
-            session.save()
-            buyer.save()
-            serializer.save(ticket=session, buyer=buyer)
\ No newline at end of file
+    def get(self, request):
+        return Response(recent_slow_requests())
+
+
+class PoolMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(pool_metrics.snapshot())
+
+
+class ScheduleImportView(APIView):
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': 'Upload a CSV or JSONL file.'})
+        format = request.data.get('format') or detect_format(upload.name)
+        if format not in FORMATS:
+            raise ValidationError({'format': f'Format must be one of {", ".join(FORMATS)}.'})
+
+        lines = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+        try:
+            summary = import_schedule(lines, format)
+        except UnicodeDecodeError:
+            raise ValidationError({'file': 'File must be UTF-8 encoded.'})
+        return Response(summary)
+
+
+class SalesExportView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        serializer = SalesExportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        filters = dict(serializer.validated_data)
+        format = filters.pop('type')
+
+        response = StreamingHttpResponse(export_sales(format, **filters), content_type=CONTENT_TYPES[format])
+        response['Content-Disposition'] = f'attachment; filename="sales.{format}"'
+        return response
+
+
+class SessionStatsViewSet(ReadOnlyModelViewSet):
+    permission_classes = [IsAdminUser]
+    queryset = SessionStats.objects.select_related('session__hall')
+    serializer_class = SessionStatsSerializer
+    filter_backends = [SessionStatsFilterBackend]
+    keyset_ordering = ('session_id',)
+
+
+class FilmDayStatsViewSet(ReadOnlyModelViewSet):
+    permission_classes = [IsAdminUser]
+    queryset = FilmDayStats.objects.select_related('film')
+    serializer_class = FilmDayStatsSerializer
+    filter_backends = [FilmDayStatsFilterBackend]
+    keyset_ordering = ('date', 'id')
+
+
+class HallDayStatsViewSet(ReadOnlyModelViewSet):
+    permission_classes = [IsAdminUser]
+    queryset = HallDayStats.objects.select_related('hall')
+    serializer_class = HallDayStatsSerializer
+    filter_backends = [HallDayStatsFilterBackend]
+    keyset_ordering = ('date', 'id')
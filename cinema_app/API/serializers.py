@@ -1,9 +1,13 @@
 from rest_framework import serializers
-from cinema_app.models import User, Hall, Film, Session, Purchase
+from cinema_app.conflicts import conflicting_sessions, find_conflicts
+from cinema_app.exports import FORMATS as EXPORT_FORMATS
+from cinema_app.ledger import pending_spent
+from cinema_app.models import User, Hall, Film, Session, Purchase, SeatHold, SessionStats, FilmDayStats, HallDayStats
+from cinema_app.recurrence import ScheduleRule
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
-    total_spent = serializers.IntegerField(read_only=True)
+    total_spent = serializers.SerializerMethodField()
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
 
     class Meta:
@@ -17,22 +21,52 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
+    def get_total_spent(self, obj):
+        pending = getattr(obj, 'pending_spent', None)
+        if pending is None:
+            pending = pending_spent(obj)
+        return obj.total_spent + pending
+
 
 class HallSerializer(serializers.ModelSerializer):
+    size = serializers.IntegerField(required=False)
+
     class Meta:
         model = Hall
-        fields = ('id', 'name', 'size',)
+        fields = ('id', 'name', 'rows', 'seats_per_row', 'size',)
 
     def validate_name(self, value):
         if len(value) == 0:
             raise serializers.ValidationError('Name must be greater than 0.')
         return value
 
+    def validate_rows(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('Rows must be greater than 0.')
+        return value
+
+    def validate_seats_per_row(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('Seats per row must be greater than 0.')
+        return value
+
     def validate_size(self, value):
         if value <= 0:
             raise serializers.ValidationError('Size must be greater than 0.')
         return value
 
+    def validate(self, attrs):
+        if 'size' in attrs and 'seats_per_row' not in attrs:
+            attrs['rows'], attrs['seats_per_row'] = 1, attrs['size']
+        if not self.instance and 'seats_per_row' not in attrs:
+            raise serializers.ValidationError('Pass either size or rows and seats_per_row.')
+
+        if self.instance and self.instance.layout_locked(
+                attrs.get('rows', self.instance.rows), attrs.get('seats_per_row', self.instance.seats_per_row)
+        ):
+            raise serializers.ValidationError('Rows and seats per row cannot change once the hall has sessions.')
+        return attrs
+
 
 class FilmSerializer(serializers.ModelSerializer):
     class Meta:
@@ -59,12 +93,28 @@ class FilmSerializer(serializers.ModelSerializer):
         return value
 
 
+class ShowtimeSerializer(serializers.Serializer):
+    time_start = serializers.TimeField()
+    time_end = serializers.TimeField()
+
+    def validate(self, attrs):
+        if attrs['time_start'] > attrs['time_end']:
+            raise serializers.ValidationError('Start time must be less than end time.')
+        return attrs
+
+
 class SessionSerializer(serializers.ModelSerializer):
     rest_of_seats = serializers.IntegerField(read_only=True)
+    extra_showtimes = ShowtimeSerializer(many=True, required=False, write_only=True)
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6), required=False, write_only=True
+    )
+    excluded_dates = serializers.ListField(child=serializers.DateField(), required=False, write_only=True)
 
     class Meta:
         model = Session
-        fields = ('id', 'date', 'time_start', 'time_end', 'price', 'rest_of_seats', 'hall', 'film',)
+        fields = ('id', 'date', 'time_start', 'time_end', 'price', 'rest_of_seats', 'hall', 'film',
+                  'extra_showtimes', 'weekdays', 'excluded_dates',)
 
     def validate(self, attrs):
         time_start = attrs.get('time_start')
@@ -75,18 +125,30 @@ class SessionSerializer(serializers.ModelSerializer):
         if time_start and time_end and time_start > time_end:
             raise serializers.ValidationError('Start time must be less than end time.')
 
-        if time_start and time_end and hall:
-            conflicting_sessions = Session.objects.filter(
-                hall=hall,
-                time_start__lt=time_end,
-                time_end__gt=time_start
-            )
+        if self.instance:
+            if conflicting_sessions(
+                    hall or self.instance.hall,
+                    attrs.get('date', self.instance.date),
+                    time_start or self.instance.time_start,
+                    time_end or self.instance.time_end,
+                    exclude_pk=self.instance.pk
+            ).exists():
+                raise serializers.ValidationError('This session conflicts with an existing session.')
+            return attrs
 
-            if self.instance:
-                conflicting_sessions = conflicting_sessions.exclude(pk=self.instance.pk)
+        self.schedule_rule = ScheduleRule(
+            film=attrs['film'],
+            hall=hall,
+            price=attrs['price'],
+            showtimes=[(time_start, time_end)] + [
+                (showtime['time_start'], showtime['time_end']) for showtime in attrs.get('extra_showtimes', [])
+            ],
+            weekdays=attrs.get('weekdays'),
+            excluded_dates=attrs.get('excluded_dates')
+        )
 
-            if conflicting_sessions.exists():
-                raise serializers.ValidationError('This session conflicts with an existing session.')
+        if find_conflicts(self.schedule_rule.sessions()):
+            raise serializers.ValidationError('This session conflicts with an existing session.')
         return attrs
 
     def validate_price(self, value):
@@ -95,20 +157,141 @@ class SessionSerializer(serializers.ModelSerializer):
         return value
 
 
+class SeatSerializer(serializers.Serializer):
+    row = serializers.IntegerField(min_value=1)
+    seat = serializers.IntegerField(min_value=1)
+
+
+def validate_seats(session, amount, seats):
+    if amount <= 0:
+        raise serializers.ValidationError('Amount must be greater than 0.')
+
+    if amount > session.rest_of_seats:
+        raise serializers.ValidationError('Rest of seats must be greater than amount.')
+
+    seats = sorted({(seat['row'], seat['seat']) for seat in seats})
+    if seats:
+        seat_map = session.get_seat_map()
+
+        if len(seats) != amount:
+            raise serializers.ValidationError('Choose as many seats as tickets.')
+        if any(row > seat_map.rows or seat > seat_map.seats_per_row for row, seat in seats):
+            raise serializers.ValidationError('There is no such seat in this hall.')
+        if not seat_map.is_free(seats):
+            raise serializers.ValidationError('Some of the selected seats are already taken.')
+    return seats
+
+
 class PurchaseSerializer(serializers.ModelSerializer):
     buyer = serializers.PrimaryKeyRelatedField(read_only=True)
+    seats = SeatSerializer(many=True, required=False)
 
     class Meta:
         model = Purchase
-        fields = ('id', 'amount', 'ticket', 'buyer',)
+        fields = ('id', 'amount', 'seats', 'ticket', 'buyer',)
 
     def validate(self, attrs):
-        amount = attrs.get('amount')
-        ticket = attrs.get('ticket')
+        attrs['seats'] = validate_seats(attrs.get('ticket'), attrs.get('amount'), attrs.get('seats', []))
+        return attrs
+
+
+class GroupPurchaseLineSerializer(serializers.Serializer):
+    session = serializers.IntegerField()
+    amount = serializers.IntegerField()
+    seats = SeatSerializer(many=True, required=False)
+
+
+class GroupPurchaseSerializer(serializers.Serializer):
+    lines = GroupPurchaseLineSerializer(many=True, allow_empty=False)
 
-        if amount <= 0:
-            raise serializers.ValidationError('Amount must be greater than 0.')
+    def validate_lines(self, lines):
+        sessions = Session.objects.select_related('hall').in_bulk({line['session'] for line in lines})
+        requested, chosen = {}, {}
+
+        for number, line in enumerate(lines, 1):
+            session = sessions.get(line['session'])
+            if session is None:
+                raise serializers.ValidationError(f'Line {number}: there is no such session.')
+            try:
+                line['seats'] = validate_seats(session, line['amount'], line.get('seats', []))
+            except serializers.ValidationError as error:
+                raise serializers.ValidationError(f'Line {number}: {error.detail[0]}')
+
+            requested[session.pk] = requested.get(session.pk, 0) + line['amount']
+            if requested[session.pk] > session.rest_of_seats:
+                raise serializers.ValidationError(f'Line {number}: rest of seats must be greater than amount.')
+            if chosen.setdefault(session.pk, set()) & set(line['seats']):
+                raise serializers.ValidationError(f'Line {number}: the same seat is chosen twice.')
+            chosen[session.pk].update(line['seats'])
+        return lines
+
+
+class SeatHoldSerializer(serializers.ModelSerializer):
+    seats = SeatSerializer(many=True, required=False)
+    session = serializers.PrimaryKeyRelatedField(read_only=True)
+    expires_at = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        model = SeatHold
+        fields = ('id', 'amount', 'seats', 'session', 'expires_at',)
+
+    def validate(self, attrs):
+        session = Session.objects.select_related('hall').get(pk=self.context['view'].kwargs['session_id'])
+        attrs['seats'] = validate_seats(session, attrs.get('amount'), attrs.get('seats', []))
+        attrs['session'] = session
+        return attrs
+
+
+class SalesExportSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=EXPORT_FORMATS, default='csv')
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    film = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        date_from = attrs.get('date_from')
+        date_to = attrs.get('date_to')
+
+        if date_from and date_to and date_from > date_to:
+            raise serializers.ValidationError('Start date must be less than end date.')
 
-        if amount > ticket.rest_of_seats:
-            raise serializers.ValidationError('Rest of seats must be greater than amount.')
         return attrs
+
+
+def occupancy(tickets, capacity):
+    return round(tickets / capacity, 4) if capacity else 0
+
+
+class SessionStatsSerializer(serializers.ModelSerializer):
+    date = serializers.DateField(source='session.date', read_only=True)
+    film = serializers.IntegerField(source='session.film_id', read_only=True)
+    hall = serializers.IntegerField(source='session.hall_id', read_only=True)
+    capacity = serializers.IntegerField(source='session.hall.size', read_only=True)
+    occupancy = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SessionStats
+        fields = ('session', 'date', 'film', 'hall', 'tickets', 'revenue', 'capacity', 'occupancy',)
+
+    def get_occupancy(self, obj):
+        return occupancy(obj.tickets, obj.session.hall.size)
+
+
+class FilmDayStatsSerializer(serializers.ModelSerializer):
+    film_name = serializers.CharField(source='film.name', read_only=True)
+
+    class Meta:
+        model = FilmDayStats
+        fields = ('id', 'film', 'film_name', 'date', 'tickets', 'revenue',)
+
+
+class HallDayStatsSerializer(serializers.ModelSerializer):
+    hall_name = serializers.CharField(source='hall.name', read_only=True)
+    occupancy = serializers.SerializerMethodField()
+
+    class Meta:
+        model = HallDayStats
+        fields = ('id', 'hall', 'hall_name', 'date', 'sessions', 'capacity', 'tickets', 'revenue', 'occupancy',)
+
+    def get_occupancy(self, obj):
+        return occupancy(obj.tickets, obj.capacity)
@@ -1,16 +1,34 @@
 from django.urls import path, include
 from rest_framework import routers
 from rest_framework.authtoken.views import ObtainAuthToken
-from .resources import UserRegistrationView, HallModelViewSet, FilmModelViewSet, SessionModelViewSet, PurchaseModelViewSet
+
+from cinema_app.async_views import session_seats, seat_feed, seat_stream
+
+from .resources import UserRegistrationView, HallModelViewSet, FilmModelViewSet, SessionModelViewSet, PurchaseModelViewSet, \
+    SeatHoldModelViewSet, SlowRequestView, GroupPurchaseView, \
+    PoolMetricsView, ScheduleImportView, SalesExportView, \
+    SessionStatsViewSet, FilmDayStatsViewSet, HallDayStatsViewSet
 
 router = routers.SimpleRouter()
 router.register(r'hall', HallModelViewSet)
 router.register('film', FilmModelViewSet)
 router.register('session', SessionModelViewSet)
 router.register(r'session/(?P<session_id>\d+)/purchase', PurchaseModelViewSet)
+router.register(r'session/(?P<session_id>\d+)/hold', SeatHoldModelViewSet)
 router.register('registration', UserRegistrationView)
+router.register('analytics/sessions', SessionStatsViewSet)
+router.register('analytics/films', FilmDayStatsViewSet)
+router.register('analytics/halls', HallDayStatsViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
-    path('login/', ObtainAuthToken.as_view())
+    path('login/', ObtainAuthToken.as_view(), name='api_login'),
+    path('async/session/<int:pk>/seats/', session_seats, name='async-session-seats'),
+    path('async/seats/feed/', seat_feed, name='seat-feed'),
+    path('async/seats/stream/', seat_stream, name='seat-stream'),
+    path('purchase/group/', GroupPurchaseView.as_view(), name='group-purchase'),
+    path('profiler/slow/', SlowRequestView.as_view(), name='slow-requests'),
+    path('profiler/pool/', PoolMetricsView.as_view(), name='pool-metrics'),
+    path('schedule/import/', ScheduleImportView.as_view(), name='schedule-import'),
+    path('sales/export/', SalesExportView.as_view(), name='sales-export'),
 ]
@@ -1,9 +1,15 @@
 from django.contrib import admin
 
-from cinema_app.models import User, Hall, Film, Session, Purchase
+from cinema_app.models import User, Hall, Film, Session, Purchase, SeatHold, SpendEntry, SessionStats, FilmDayStats, \
+    HallDayStats
 
 admin.site.register(User)
 admin.site.register(Hall)
 admin.site.register(Film)
 admin.site.register(Session)
-admin.site.register(Purchase)
\ No newline at end of file
+admin.site.register(Purchase)
+admin.site.register(SeatHold)
+admin.site.register(SpendEntry)
+admin.site.register(SessionStats)
+admin.site.register(FilmDayStats)
+admin.site.register(HallDayStats)
@@ -0,0 +1,123 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from cinema_app.models import Purchase, Session, SessionStats, FilmDayStats, HallDayStats
+
+SALE_FIELDS = ('id', 'amount', 'price', 'ticket_id', 'ticket__date', 'ticket__film_id', 'ticket__hall_id')
+
+
+def _totals(sales, key):
+    totals = defaultdict(lambda: [0, 0])
+    for sale in sales:
+        total = totals[key(sale)]
+        total[0] += sale['amount']
+        total[1] += sale['amount'] * sale['price']
+    return totals
+
+
+def _increment(model, fields, totals):
+    model.objects.bulk_create([model(**dict(zip(fields, key))) for key in totals], ignore_conflicts=True)
+    for key, (tickets, revenue) in totals.items():
+        model.objects.filter(**dict(zip(fields, key))).update(
+            tickets=F('tickets') + tickets, revenue=F('revenue') + revenue
+        )
+
+
+def refresh_capacity(hall_days):
+    hall_days = {(hall_id, day) for hall_id, day in hall_days if day is not None}
+    if not hall_days:
+        return
+    condition = Q()
+    for hall_id, day in hall_days:
+        condition |= Q(hall_id=hall_id, date=day)
+    capacity = dict.fromkeys(hall_days, (0, 0))
+    for row in Session.objects.filter(condition).values('hall_id', 'date').annotate(
+            sessions=Count('id'), capacity=Sum('hall__size')).order_by():
+        capacity[row['hall_id'], row['date']] = row['sessions'], row['capacity']
+    for (hall_id, day), (sessions, seats) in capacity.items():
+        HallDayStats.objects.filter(hall_id=hall_id, date=day).update(sessions=sessions, capacity=seats)
+
+
+def _apply(sales):
+    Purchase.objects.filter(pk__in=[sale['id'] for sale in sales]).update(counted=True)
+
+    _increment(SessionStats, ('session_id',), _totals(sales, lambda sale: (sale['ticket_id'],)))
+    dated = [sale for sale in sales if sale['ticket__date'] is not None]
+    _increment(FilmDayStats, ('film_id', 'date'),
+               _totals(dated, lambda sale: (sale['ticket__film_id'], sale['ticket__date'])))
+    hall_days = _totals(dated, lambda sale: (sale['ticket__hall_id'], sale['ticket__date']))
+    _increment(HallDayStats, ('hall_id', 'date'), hall_days)
+    refresh_capacity(hall_days)
+
+
+def _pending_sales():
+    return Purchase.objects.select_for_update(skip_locked=True, of=('self',)).filter(counted=False).values(*SALE_FIELDS)
+
+
+def apply_sales(purchase_ids):
+    with transaction.atomic():
+        sales = list(_pending_sales().filter(pk__in=purchase_ids))
+        if sales:
+            _apply(sales)
+
+
+def record_sales(purchases):
+    purchase_ids = [purchase.pk for purchase in purchases]
+    transaction.on_commit(lambda: apply_sales(purchase_ids), robust=True)
+
+
+def roll_up_sales(batch_size=1000):
+    rolled_up = 0
+
+    while True:
+        with transaction.atomic():
+            sales = list(_pending_sales().order_by('id')[:batch_size])
+            if not sales:
+                return rolled_up
+            _apply(sales)
+        rolled_up += len(sales)
+
+
+def rebuild_sales_stats(batch_size=1000):
+    with transaction.atomic():
+        Purchase.objects.filter(counted=False).update(counted=True)
+        SessionStats.objects.all().delete()
+        FilmDayStats.objects.all().delete()
+        HallDayStats.objects.all().delete()
+
+        sales = Purchase.objects.filter(counted=True)
+        revenue = Sum(F('amount') * F('price'))
+        SessionStats.objects.bulk_create((
+            SessionStats(session_id=row['ticket_id'], tickets=row['tickets'], revenue=row['revenue'])
+            for row in sales.values('ticket_id').annotate(tickets=Sum('amount'), revenue=revenue).order_by()
+        ), batch_size=batch_size)
+        dated = sales.filter(ticket__date__isnull=False)
+        FilmDayStats.objects.bulk_create((
+            FilmDayStats(film_id=row['ticket__film_id'], date=row['ticket__date'],
+                         tickets=row['tickets'], revenue=row['revenue'])
+            for row in dated.values('ticket__film_id', 'ticket__date').annotate(
+                tickets=Sum('amount'), revenue=revenue
+            ).order_by()
+        ), batch_size=batch_size)
+
+        sold = {
+            (row['ticket__hall_id'], row['ticket__date']): (row['tickets'], row['revenue'])
+            for row in dated.values('ticket__hall_id', 'ticket__date').annotate(
+                tickets=Sum('amount'), revenue=revenue
+            ).order_by()
+        }
+        hall_days = []
+        for row in Session.objects.filter(date__isnull=False).values('hall_id', 'date').annotate(
+                sessions=Count('id'), capacity=Sum('hall__size')).order_by():
+            tickets, revenue_total = sold.get((row['hall_id'], row['date']), (0, 0))
+            hall_days.append(HallDayStats(hall_id=row['hall_id'], date=row['date'], sessions=row['sessions'],
+                                          capacity=row['capacity'], tickets=tickets, revenue=revenue_total))
+        HallDayStats.objects.bulk_create(hall_days, batch_size=batch_size)
+
+    return {
+        'sessions': SessionStats.objects.count(),
+        'film_days': FilmDayStats.objects.count(),
+        'hall_days': HallDayStats.objects.count(),
+    }
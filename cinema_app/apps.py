@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CinemaAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cinema_app'
+
+    def ready(self):
+        from cinema_app import checks, signals  # noqa: F401
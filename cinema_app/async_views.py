@@ -0,0 +1,131 @@
+import asyncio
+import json
+from functools import wraps
+from weakref import WeakKeyDictionary
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render
+
+from cinema_app.feed import get_feed, parse_watch
+from cinema_app.forms import PurchaseForm
+from cinema_app.models import Session
+from cinema_app.schedule import aget_schedule_snapshot
+from cinema_app.views import get_seat_rows, get_seat_feed_context, get_selected_date, get_schedule_context
+
+ASYNC_READ_CONCURRENCY = getattr(settings, 'ASYNC_READ_CONCURRENCY', 100)
+SEAT_FEED_TIMEOUT = getattr(settings, 'SEAT_FEED_TIMEOUT', 25)
+SEAT_FEED_HEARTBEAT = getattr(settings, 'SEAT_FEED_HEARTBEAT', 15)
+SEAT_STREAM_LIFETIME = getattr(settings, 'SEAT_STREAM_LIFETIME', 300)
+SEAT_STREAM_RETRY = getattr(settings, 'SEAT_STREAM_RETRY', 3000)
+WATCH_REQUIRED = 'Pass the sessions to watch as watch=<session>:<version>,...'
+
+_semaphores = WeakKeyDictionary()
+
+
+def bounded(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        semaphore = _semaphores.get(loop)
+        if semaphore is None:
+            semaphore = _semaphores[loop] = asyncio.Semaphore(ASYNC_READ_CONCURRENCY)
+        async with semaphore:
+            return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def load_user(request):
+    await sync_to_async(lambda: request.user.is_authenticated)()
+
+
+async def get_session(pk, *related):
+    try:
+        return await Session.objects.select_related(*related).aget(pk=pk)
+    except Session.DoesNotExist:
+        raise Http404('No session found matching the query')
+
+
+@bounded
+async def schedule(request):
+    snapshot = await aget_schedule_snapshot(get_selected_date(request), request.GET.get('sort_by', 'default'))
+    await load_user(request)
+    return render(request, 'film_list.html', {'films': snapshot, **get_schedule_context(request)})
+
+
+@bounded
+async def film_detail(request, pk):
+    session = await get_session(pk, 'film', 'hall')
+    await load_user(request)
+    return render(request, 'detail_film.html', {
+        'session': session,
+        'object': session,
+        'seat_rows': get_seat_rows(session),
+        'form': PurchaseForm(),
+        **get_seat_feed_context(request),
+    })
+
+
+@bounded
+async def session_seats(request, pk):
+    session = await get_session(pk, 'hall')
+    amount = request.GET.get('amount', '')
+    return JsonResponse(session.get_seat_map().availability(int(amount) if amount.isdigit() else None))
+
+
+def get_timeout(request):
+    try:
+        return min(max(float(request.GET.get('timeout', SEAT_FEED_TIMEOUT)), 0), SEAT_FEED_TIMEOUT)
+    except ValueError:
+        return SEAT_FEED_TIMEOUT
+
+
+async def seat_feed(request):
+    versions = parse_watch(request.GET.get('watch', ''))
+    if not versions:
+        return JsonResponse({'detail': WATCH_REQUIRED}, status=400)
+
+    feed = get_feed()
+    watcher = feed.subscribe(versions)
+    try:
+        deltas = await watcher.wait(get_timeout(request))
+    finally:
+        feed.unsubscribe(watcher)
+    return JsonResponse(deltas, safe=False)
+
+
+async def seat_stream(request):
+    # WSGI drains the iterator before sending anything; 204 stops EventSource from reconnecting.
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    versions = parse_watch(request.GET.get('watch', ''))
+    if not versions:
+        return JsonResponse({'detail': WATCH_REQUIRED}, status=400)
+    for session_id, version in parse_watch(request.headers.get('Last-Event-ID', '')).items():
+        if session_id in versions:
+            versions[session_id] = max(versions[session_id], version)
+
+    async def events():
+        feed = get_feed()
+        watcher = feed.subscribe(versions)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SEAT_STREAM_LIFETIME
+        try:
+            yield f'retry: {SEAT_STREAM_RETRY}\n\n'
+            while (remaining := deadline - loop.time()) > 0:
+                deltas = await watcher.wait(min(SEAT_FEED_HEARTBEAT, remaining))
+                if not deltas:
+                    yield ': keep-alive\n\n'
+                for delta in deltas:
+                    yield f'id: {delta["session"]}:{delta["version"]}\nevent: seats\ndata: {json.dumps(delta)}\n\n'
+            yield f'retry: {SEAT_STREAM_RETRY}\n\n'
+        finally:
+            feed.unsubscribe(watcher)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
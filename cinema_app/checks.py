@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+CACHED_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+
+def process_local(alias):
+    return not getattr(settings, 'TESTING', False) and settings.CACHES[alias]['BACKEND'] in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if not process_local('default'):
+        return []
+    return [Error(
+        f'{settings.CACHES["default"]["BACKEND"]} keeps a separate copy in every worker process.',
+        hint='Point CACHES["default"] at Redis or Memcached so schedule snapshots, seat counts and '
+             'API ETags are invalidated for all workers.',
+        id='cinema_app.E001',
+    )]
+
+
+@register(Tags.caches)
+def check_session_cache(app_configs, **kwargs):
+    if settings.SESSION_ENGINE not in CACHED_SESSION_ENGINES or not process_local(settings.SESSION_CACHE_ALIAS):
+        return []
+    return [Error(
+        f'{settings.SESSION_ENGINE} is backed by a per-process cache.',
+        hint='Other workers would keep serving a session after logout. Use a shared cache or '
+             'django.contrib.sessions.backends.db.',
+        id='cinema_app.E002',
+    )]
+
+
+@register()
+def check_idle_timeout(app_configs, **kwargs):
+    idle = getattr(settings, 'INACTIVE_USER_TIMEOUT', 1800) - getattr(settings, 'INACTIVE_USER_WRITE_GRANULARITY', 60)
+    hold_ttl = getattr(settings, 'SEAT_HOLD_TTL', 600)
+    if idle >= hold_ttl:
+        return []
+    return [Error(
+        f'Idle users can be logged out after {idle}s, before their {hold_ttl}s seat hold expires.',
+        hint='Set INACTIVE_USER_TIMEOUT to at least SEAT_HOLD_TTL + INACTIVE_USER_WRITE_GRANULARITY.',
+        id='cinema_app.E003',
+    )]
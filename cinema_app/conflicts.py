@@ -0,0 +1,79 @@
+from collections import defaultdict
+
+from cinema_app.models import Session
+
+SQLITE_OVERLAP_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS session_hall_no_overlap_insert BEFORE INSERT ON cinema_app_session
+    WHEN NEW.date IS NOT NULL AND EXISTS (
+        SELECT 1 FROM cinema_app_session
+        WHERE hall_id = NEW.hall_id AND date = NEW.date
+        AND time_start < NEW.time_end AND time_end > NEW.time_start
+    )
+    BEGIN SELECT RAISE(ABORT, 'session_hall_no_overlap'); END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS session_hall_no_overlap_update
+    BEFORE UPDATE OF date, time_start, time_end, hall_id ON cinema_app_session
+    WHEN NEW.date IS NOT NULL AND EXISTS (
+        SELECT 1 FROM cinema_app_session
+        WHERE hall_id = NEW.hall_id AND date = NEW.date AND id != NEW.id
+        AND time_start < NEW.time_end AND time_end > NEW.time_start
+    )
+    BEGIN SELECT RAISE(ABORT, 'session_hall_no_overlap'); END
+    """,
+]
+
+
+def overlaps(first_start, first_end, second_start, second_end):
+    return first_start < second_end and first_end > second_start
+
+
+def conflicting_sessions(hall, date, time_start, time_end, exclude_pk=None):
+    sessions = Session.objects.filter(
+        hall=hall,
+        date=date,
+        time_start__lt=time_end,
+        time_end__gt=time_start
+    )
+
+    if exclude_pk is not None:
+        sessions = sessions.exclude(pk=exclude_pk)
+
+    return sessions
+
+
+def find_conflicts(candidates):
+    candidates = list(candidates)
+    if not candidates:
+        return []
+
+    existing = defaultdict(list)
+    for session in Session.objects.filter(
+            hall_id__in={candidate.hall_id for candidate in candidates},
+            date__range=(min(candidate.date for candidate in candidates),
+                         max(candidate.date for candidate in candidates)),
+            time_start__lt=max(candidate.time_end for candidate in candidates),
+            time_end__gt=min(candidate.time_start for candidate in candidates)
+    ).exclude(
+        pk__in=[candidate.pk for candidate in candidates if candidate.pk]
+    ).only('id', 'hall_id', 'date', 'time_start', 'time_end'):
+        existing[session.hall_id, session.date].append(session)
+
+    conflicts = []
+    for candidate in candidates:
+        key = candidate.hall_id, candidate.date
+        if any(overlaps(candidate.time_start, candidate.time_end, session.time_start, session.time_end)
+               for session in existing[key]):
+            conflicts.append(candidate)
+        existing[key].append(candidate)
+
+    return conflicts
+
+
+def install_sqlite_overlap_triggers(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in SQLITE_OVERLAP_TRIGGERS:
+            cursor.execute(statement)
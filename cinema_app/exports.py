@@ -0,0 +1,68 @@
+import csv
+import json
+
+from django.conf import settings
+
+from cinema_app.models import Purchase
+
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+FIELDS = (
+    ('purchase', 'id'),
+    ('session', 'ticket_id'),
+    ('date', 'ticket__date'),
+    ('time_start', 'ticket__time_start'),
+    ('time_end', 'ticket__time_end'),
+    ('film_id', 'ticket__film_id'),
+    ('film', 'ticket__film__name'),
+    ('hall_id', 'ticket__hall_id'),
+    ('hall', 'ticket__hall__name'),
+    ('buyer_id', 'buyer_id'),
+    ('buyer', 'buyer__username'),
+    ('amount', 'amount'),
+    ('price', 'price'),
+    ('seats', 'seats'),
+)
+COLUMNS = [name for name, _ in FIELDS] + ['total']
+
+
+def sales(date_from=None, date_to=None, film=None):
+    purchases = Purchase.objects.all()
+    if date_from is not None:
+        purchases = purchases.filter(ticket__date__gte=date_from)
+    if date_to is not None:
+        purchases = purchases.filter(ticket__date__lte=date_to)
+    if film is not None:
+        purchases = purchases.filter(ticket__film_id=film)
+    return purchases.order_by('id').values(*(lookup for _, lookup in FIELDS))
+
+
+def sale_records(purchases, chunk_size=EXPORT_CHUNK_SIZE):
+    for row in purchases.iterator(chunk_size=chunk_size):
+        record = {name: row[lookup] for name, lookup in FIELDS}
+        record['total'] = record['amount'] * record['price']
+        yield record
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    writer = csv.writer(Echo())
+    yield writer.writerow(COLUMNS)
+    for record in records:
+        record['seats'] = ' '.join(f'{seat["row"]}-{seat["seat"]}' for seat in record['seats'])
+        yield writer.writerow([record[column] for column in COLUMNS])
+
+
+def jsonl_lines(records):
+    for record in records:
+        yield json.dumps(record, default=str) + '\n'
+
+
+def export_sales(format='csv', chunk_size=EXPORT_CHUNK_SIZE, **filters):
+    records = sale_records(sales(**filters), chunk_size)
+    return csv_lines(records) if format == 'csv' else jsonl_lines(records)
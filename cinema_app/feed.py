@@ -0,0 +1,106 @@
+import asyncio
+from collections import defaultdict
+from weakref import WeakKeyDictionary
+
+from django.conf import settings
+
+from cinema_app.models import Session
+from cinema_app.seatmap import SeatMap
+
+SEAT_FEED_INTERVAL = getattr(settings, 'SEAT_FEED_INTERVAL', 1)
+
+_feeds = WeakKeyDictionary()
+
+
+def parse_watch(value):
+    watched = {}
+    for item in value.split(','):
+        session_id, _, version = item.strip().partition(':')
+        if session_id.isdigit():
+            watched[int(session_id)] = int(version) if version.isdigit() else -1
+    return watched
+
+
+class Watcher:
+    def __init__(self, versions):
+        self.versions = versions
+        self.deltas = asyncio.Queue()
+
+    def offer(self, delta):
+        if delta['version'] > self.versions.get(delta['session'], -1):
+            self.versions[delta['session']] = delta['version']
+            self.deltas.put_nowait(delta)
+
+    def drain(self):
+        deltas = []
+        while not self.deltas.empty():
+            deltas.append(self.deltas.get_nowait())
+        return deltas
+
+    async def wait(self, timeout):
+        try:
+            first = await asyncio.wait_for(self.deltas.get(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        return [first, *self.drain()]
+
+
+class SeatFeed:
+    def __init__(self, interval=SEAT_FEED_INTERVAL):
+        self.interval = interval
+        self.watchers = defaultdict(set)
+        self.latest = {}
+        self.task = None
+
+    def subscribe(self, versions):
+        watcher = Watcher(dict(versions))
+        for session_id in versions:
+            self.watchers[session_id].add(watcher)
+            if session_id in self.latest:
+                watcher.offer(self.latest[session_id])
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return watcher
+
+    def unsubscribe(self, watcher):
+        for session_id in watcher.versions:
+            watchers = self.watchers.get(session_id)
+            if watchers is None:
+                continue
+            watchers.discard(watcher)
+            if not watchers:
+                del self.watchers[session_id]
+                self.latest.pop(session_id, None)
+
+    async def poll(self):
+        rows = Session.objects.filter(pk__in=list(self.watchers)).values(
+            'id', 'seats_version', 'rest_of_seats', 'seat_map', 'hall__rows', 'hall__seats_per_row'
+        )
+        async for row in rows:
+            latest = self.latest.get(row['id'])
+            if latest is not None and latest['version'] == row['seats_version']:
+                continue
+
+            seat_map = SeatMap(row['hall__rows'], row['hall__seats_per_row'], row['seat_map'])
+            delta = self.latest[row['id']] = {
+                'session': row['id'],
+                'version': row['seats_version'],
+                'rest_of_seats': row['rest_of_seats'],
+                'map': seat_map.render(),
+            }
+            for watcher in list(self.watchers.get(row['id'], ())):
+                watcher.offer(delta)
+
+    async def run(self):
+        while self.watchers:
+            await self.poll()
+            await asyncio.sleep(self.interval)
+
+
+def get_feed():
+    loop = asyncio.get_running_loop()
+    feed = _feeds.get(loop)
+    if feed is None:
+        feed = _feeds[loop] = SeatFeed()
+    return feed
@@ -1,8 +1,12 @@
+from datetime import datetime
+
 from django.contrib import messages
 from django.contrib.auth.forms import UserCreationForm
-from django.forms import ModelForm, TimeInput, DateInput
+from django.forms import ModelForm, TimeInput, DateInput, MultipleChoiceField, CheckboxSelectMultiple, CharField
 
 from cinema_app.models import User, Hall, Session, Film, Purchase
+from cinema_app.conflicts import conflicting_sessions, find_conflicts
+from cinema_app.recurrence import WEEKDAYS, ScheduleRule
 
 
 class UserForm(UserCreationForm):
@@ -14,7 +18,7 @@ class UserForm(UserCreationForm):
 class HallForm(ModelForm):
     class Meta:
         model = Hall
-        fields = ('name', 'size')
+        fields = ('name', 'rows', 'seats_per_row')
 
     def __init__(self, *args, **kwargs):
         if 'request' in kwargs:
@@ -30,14 +34,33 @@ class HallForm(ModelForm):
 
         return name
 
-    def clean_size(self):
-        size = self.cleaned_data.get('size')
+    def clean_rows(self):
+        rows = self.cleaned_data.get('rows')
+
+        if rows <= 0:
+            self.add_error('rows', 'Error')
+            messages.error(self.request, 'Rows must be greater than 0')
+
+        return rows
+
+    def clean_seats_per_row(self):
+        seats_per_row = self.cleaned_data.get('seats_per_row')
+
+        if seats_per_row <= 0:
+            self.add_error('seats_per_row', 'Error')
+            messages.error(self.request, 'Seats per row must be greater than 0')
+
+        return seats_per_row
+
+    def clean(self):
+        cleaned_data = super().clean()
+        layout = cleaned_data.get('rows'), cleaned_data.get('seats_per_row')
 
-        if size <= 0:
-            self.add_error('size', 'Error')
-            messages.error(self.request, 'Size must be greater than 0')
+        if self.instance.layout_locked(*layout):
+            self.add_error(None, 'Error')
+            messages.error(self.request, 'Rows and seats per row cannot change once the hall has sessions')
 
-        return size
+        return cleaned_data
 
 
 class FilmForm(ModelForm):
@@ -92,6 +115,10 @@ class FilmForm(ModelForm):
 
 
 class SessionForm(ModelForm):
+    weekdays = MultipleChoiceField(choices=WEEKDAYS, widget=CheckboxSelectMultiple, required=False)
+    extra_showtimes = CharField(required=False, help_text='HH:MM-HH:MM, separated by commas')
+    excluded_dates = CharField(required=False, help_text='YYYY-MM-DD, separated by commas')
+
     class Meta:
         model = Session
         fields = ('time_start', 'time_end', 'price', 'hall', 'film',)
@@ -128,17 +155,20 @@ class SessionForm(ModelForm):
             self.add_error(None, 'Error')
             messages.error(self.request, 'time start must by less time end!')
 
-        if time_start and time_end and hall:
-            conflicting_sessions = Session.objects.filter(
+        self.showtimes = [(time_start, time_end)] + cleaned_data.get('extra_showtimes', [])
+        film = cleaned_data.get('film')
+
+        if film and hall:
+            self.schedule_rule = ScheduleRule(
+                film=film,
                 hall=hall,
-                time_start__lt=time_end,
-                time_end__gt=time_start
+                price=cleaned_data.get('price'),
+                showtimes=self.showtimes,
+                weekdays=cleaned_data.get('weekdays'),
+                excluded_dates=cleaned_data.get('excluded_dates')
             )
 
-            if self.instance:
-                conflicting_sessions = conflicting_sessions.exclude(pk=self.instance.pk)
-
-            if conflicting_sessions.exists():
+            if find_conflicts(self.schedule_rule.sessions()):
                 self.add_error(None, 'Error')
                 messages.error(self.request, 'This session conflicts with an existing session.')
 
@@ -153,8 +183,86 @@ class SessionForm(ModelForm):
 
         return price
 
+    def clean_weekdays(self):
+        return [int(weekday) for weekday in self.cleaned_data.get('weekdays', [])]
+
+    def clean_extra_showtimes(self):
+        showtimes = []
+
+        for value in self.cleaned_data.get('extra_showtimes', '').split(','):
+            if not value.strip():
+                continue
+            try:
+                time_start, time_end = (datetime.strptime(part.strip(), '%H:%M').time()
+                                        for part in value.split('-'))
+            except ValueError:
+                self.add_error(None, 'Error')
+                messages.error(self.request, 'showtimes must look like HH:MM-HH:MM')
+                continue
+
+            if time_start > time_end:
+                self.add_error(None, 'Error')
+                messages.error(self.request, 'time start must by less time end!')
+                continue
+            showtimes.append((time_start, time_end))
+
+        return showtimes
+
+    def clean_excluded_dates(self):
+        excluded_dates = []
+
+        for value in self.cleaned_data.get('excluded_dates', '').split(','):
+            if not value.strip():
+                continue
+            try:
+                excluded_dates.append(datetime.strptime(value.strip(), '%Y-%m-%d').date())
+            except ValueError:
+                self.add_error(None, 'Error')
+                messages.error(self.request, 'excluded dates must look like YYYY-MM-DD')
+
+        return excluded_dates
+
+
+class SessionUpdateForm(ModelForm):
+    class Meta(SessionForm.Meta):
+        pass
+
+    def __init__(self, *args, **kwargs):
+        if 'request' in kwargs:
+            self.request = kwargs.pop('request')
+
+        super().__init__(*args, **kwargs)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        hall = cleaned_data.get('hall')
+        time_start = cleaned_data.get('time_start')
+        time_end = cleaned_data.get('time_end')
+
+        if time_start and time_end and time_start > time_end:
+            self.add_error(None, 'Error')
+            messages.error(self.request, 'time start must by less time end!')
+        elif hall and time_start and time_end and conflicting_sessions(
+                hall, self.instance.date, time_start, time_end, exclude_pk=self.instance.pk
+        ).exists():
+            self.add_error(None, 'Error')
+            messages.error(self.request, 'This session conflicts with an existing session.')
+
+        return cleaned_data
+
+    def clean_price(self):
+        price = self.cleaned_data.get('price')
+
+        if price <= 0:
+            self.add_error(None, 'Error')
+            messages.error(self.request, 'price must be greater than 0')
+
+        return price
+
 
 class PurchaseForm(ModelForm):
+    seats = CharField(required=False, help_text='row-seat, separated by commas')
+
     class Meta:
         model = Purchase
         fields = ('amount',)
@@ -171,7 +279,7 @@ class PurchaseForm(ModelForm):
     def clean(self):
         cleaned_data = super().clean()
         amount = cleaned_data.get('amount')
-        session = Session.objects.get(pk=self.session_id)
+        session = Session.objects.select_related('hall').get(pk=self.session_id)
         self.session = session
 
         if amount <= 0:
@@ -182,3 +290,34 @@ class PurchaseForm(ModelForm):
         if amount > session.rest_of_seats:
             self.add_error(None, 'Error')
             messages.error(self.request, 'Rest of seats must be greater than amount')
+
+        self.seats = cleaned_data.get('seats', [])
+        if self.seats:
+            seat_map = session.get_seat_map()
+
+            if len(self.seats) != amount:
+                self.add_error(None, 'Error')
+                messages.error(self.request, 'Choose as many seats as tickets')
+            elif any(not (1 <= row <= seat_map.rows and 1 <= seat <= seat_map.seats_per_row)
+                     for row, seat in self.seats):
+                self.add_error(None, 'Error')
+                messages.error(self.request, 'There is no such seat in this hall')
+            elif not seat_map.is_free(self.seats):
+                self.add_error(None, 'Error')
+                messages.error(self.request, 'Some of the selected seats are already taken')
+
+    def clean_seats(self):
+        seats = []
+
+        for value in self.cleaned_data.get('seats', '').split(','):
+            if not value.strip():
+                continue
+            try:
+                row, seat = (int(part) for part in value.split('-'))
+            except ValueError:
+                self.add_error(None, 'Error')
+                messages.error(self.request, 'seats must look like row-seat')
+                continue
+            seats.append((row, seat))
+
+        return sorted(set(seats))
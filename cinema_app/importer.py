@@ -0,0 +1,248 @@
+import csv
+import json
+from datetime import date, time
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models import Q
+
+from cinema_app import analytics, schedule, versions
+from cinema_app.conflicts import find_conflicts
+from cinema_app.models import Hall, Film, Session
+
+IMPORT_CHUNK_SIZE = getattr(settings, 'IMPORT_CHUNK_SIZE', 1000)
+IMPORT_MAX_ERRORS = getattr(settings, 'IMPORT_MAX_ERRORS', 100)
+FORMATS = ('csv', 'jsonl')
+REQUIRED = ('film', 'hall', 'date', 'time_start', 'time_end', 'price')
+
+
+class RowError(Exception):
+    pass
+
+
+def detect_format(filename, default='csv'):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension in FORMATS:
+        return extension
+    return 'jsonl' if extension in ('json', 'ndjson') else default
+
+
+def read_rows(lines, format='csv'):
+    if format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield line_number, RowError(f'Invalid JSON: {error}')
+            continue
+        yield line_number, row if isinstance(row, dict) else RowError('Each line must be a JSON object.')
+
+
+def parse(value, parser, field):
+    try:
+        return parser(str(value).strip())
+    except (TypeError, ValueError):
+        raise RowError(f'Invalid {field}: {value!r}.')
+
+
+def positive(value):
+    value = int(value)
+    if value <= 0:
+        raise ValueError
+    return value
+
+
+def text(row, field):
+    return str(row.get(field) or '').strip()
+
+
+def parse_row(row):
+    if isinstance(row, RowError):
+        raise row
+
+    missing = [field for field in REQUIRED if not text(row, field)]
+    if missing:
+        raise RowError(f'Missing {", ".join(missing)}.')
+
+    showtime = {
+        'film': text(row, 'film'),
+        'hall': text(row, 'hall'),
+        'date': parse(row['date'], date.fromisoformat, 'date'),
+        'time_start': parse(row['time_start'], time.fromisoformat, 'time_start'),
+        'time_end': parse(row['time_end'], time.fromisoformat, 'time_end'),
+        'price': parse(row['price'], positive, 'price'),
+        'description': text(row, 'description'),
+        'rows': parse(row['rows'], positive, 'rows') if text(row, 'rows') else None,
+        'seats_per_row': parse(row['seats_per_row'], positive, 'seats_per_row') if text(row, 'seats_per_row') else None,
+    }
+    if showtime['time_start'] >= showtime['time_end']:
+        raise RowError('Start time must be less than end time.')
+    return showtime
+
+
+class ScheduleImport:
+    def __init__(self, chunk_size=IMPORT_CHUNK_SIZE, max_errors=IMPORT_MAX_ERRORS, on_error=None):
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.on_error = on_error
+        self.films = {}
+        self.halls = {}
+        self.film_dates = {}
+        self.hall_days = set()
+        self.rows = self.created = self.skipped = self.failed = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'error': message})
+        if self.on_error is not None:
+            self.on_error(line, message)
+
+    def run(self, rows):
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self.rows += len(chunk)
+            self.import_chunk(chunk)
+
+        self.widen_film_dates()
+        if self.created:
+            transaction.on_commit(schedule.invalidate_all)
+            transaction.on_commit(lambda: versions.bump('session'))
+            transaction.on_commit(lambda: analytics.refresh_capacity(self.hall_days))
+        return self.summary()
+
+    def summary(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'films': len(self.films),
+            'halls': len(self.halls),
+            'errors': self.errors,
+        }
+
+    def load(self, model, cache, names):
+        missing = set(names) - cache.keys()
+        if missing:
+            for instance in model.objects.filter(name__in=missing).order_by('-id'):
+                cache[instance.name] = instance
+
+    def get_hall(self, showtime):
+        hall = self.halls.get(showtime['hall'])
+        if hall is None:
+            if not showtime['rows'] or not showtime['seats_per_row']:
+                raise RowError(f'Unknown hall {showtime["hall"]!r}, pass rows and seats_per_row to create it.')
+            hall = Hall(name=showtime['hall'], rows=showtime['rows'], seats_per_row=showtime['seats_per_row'])
+            hall.save()
+            self.halls[hall.name] = hall
+        return hall
+
+    def get_film(self, showtime):
+        film = self.films.get(showtime['film'])
+        if film is None:
+            film = Film.objects.create(name=showtime['film'], description=showtime['description'] or showtime['film'],
+                                       date_start=showtime['date'], date_finish=showtime['date'])
+            self.films[film.name] = film
+        first, last = self.film_dates.get(film.pk, (showtime['date'], showtime['date']))
+        self.film_dates[film.pk] = min(first, showtime['date']), max(last, showtime['date'])
+        return film
+
+    def import_chunk(self, chunk):
+        parsed = []
+        for line, row in chunk:
+            try:
+                parsed.append((line, parse_row(row)))
+            except RowError as error:
+                self.error(line, str(error))
+
+        self.load(Hall, self.halls, {showtime['hall'] for _, showtime in parsed})
+        self.load(Film, self.films, {showtime['film'] for _, showtime in parsed})
+
+        with transaction.atomic():
+            candidates = []
+            for line, showtime in parsed:
+                try:
+                    hall, film = self.get_hall(showtime), self.get_film(showtime)
+                except RowError as error:
+                    self.error(line, str(error))
+                    continue
+                session = Session(date=showtime['date'], time_start=showtime['time_start'],
+                                  time_end=showtime['time_end'], price=showtime['price'],
+                                  rest_of_seats=hall.size, hall=hall, film=film)
+                session.line = line
+                candidates.append(session)
+
+            candidates = self.skip_existing(candidates)
+            conflicts = {id(session) for session in find_conflicts(candidates)}
+            sessions = []
+            for session in candidates:
+                if id(session) in conflicts:
+                    self.error(session.line, f'Overlaps another session in {session.hall.name} on {session.date}.')
+                else:
+                    sessions.append(session)
+            self.save(sessions)
+
+    def skip_existing(self, candidates):
+        if not candidates:
+            return []
+
+        slots = Q()
+        for hall_id in {session.hall_id for session in candidates}:
+            dates = [session.date for session in candidates if session.hall_id == hall_id]
+            slots |= Q(hall_id=hall_id, date__range=(min(dates), max(dates)))
+        existing = set(Session.objects.filter(slots).values_list('hall_id', 'date', 'time_start', 'film_id'))
+
+        remaining = []
+        for session in candidates:
+            key = session.hall_id, session.date, session.time_start, session.film_id
+            if key in existing:
+                self.skipped += 1
+            else:
+                existing.add(key)
+                remaining.append(session)
+        return remaining
+
+    def save(self, sessions):
+        if not sessions:
+            return
+        try:
+            with transaction.atomic():
+                Session.objects.bulk_create(sessions)
+            self.created += len(sessions)
+            self.hall_days.update((session.hall_id, session.date) for session in sessions)
+        except IntegrityError:
+            for session in sessions:
+                session.pk = None
+                try:
+                    with transaction.atomic():
+                        session.save()
+                    self.created += 1
+                    self.hall_days.add((session.hall_id, session.date))
+                except IntegrityError:
+                    self.error(session.line, f'Overlaps another session in {session.hall.name} on {session.date}.')
+
+    def widen_film_dates(self):
+        for film in self.films.values():
+            if film.pk not in self.film_dates:
+                continue
+            first, last = self.film_dates[film.pk]
+            if first < film.date_start or last > film.date_finish:
+                film.date_start, film.date_finish = min(first, film.date_start), max(last, film.date_finish)
+                Film.objects.filter(pk=film.pk).update(date_start=film.date_start, date_finish=film.date_finish)
+
+
+def import_schedule(lines, format='csv', **options):
+    return ScheduleImport(**options).run(read_rows(lines, format))
@@ -0,0 +1,87 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Sum, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from cinema_app.models import SpendEntry, User, Purchase
+
+
+def _apply(entries):
+    totals = defaultdict(int)
+    for entry in entries:
+        totals[entry.buyer_id] += entry.amount
+
+    SpendEntry.objects.filter(pk__in=[entry.pk for entry in entries]).update(rolled_up=True)
+    for buyer_id, amount in totals.items():
+        User.objects.filter(pk=buyer_id).update(total_spent=F('total_spent') + amount)
+
+
+def apply_entry(entry_id):
+    with transaction.atomic():
+        _apply(SpendEntry.objects.select_for_update(skip_locked=True).filter(pk=entry_id, rolled_up=False))
+
+
+def record_spend(purchase, amount):
+    entry = SpendEntry.objects.create(amount=amount, buyer_id=purchase.buyer_id, purchase=purchase)
+    transaction.on_commit(lambda: apply_entry(entry.pk), robust=True)
+    return entry
+
+
+def record_group_spend(buyer, amount):
+    entry = SpendEntry.objects.create(amount=amount, buyer=buyer)
+    transaction.on_commit(lambda: apply_entry(entry.pk), robust=True)
+    return entry
+
+
+def roll_up_spend(batch_size=1000):
+    rolled_up = 0
+
+    while True:
+        with transaction.atomic():
+            entries = list(
+                SpendEntry.objects.select_for_update(skip_locked=True)
+                .filter(rolled_up=False).only('id', 'buyer_id', 'amount')[:batch_size]
+            )
+            if not entries:
+                return rolled_up
+            _apply(entries)
+        rolled_up += len(entries)
+
+
+def pending_spent(user):
+    return user.spend_entries.filter(rolled_up=False).aggregate(pending=Sum('amount'))['pending'] or 0
+
+
+def with_pending_spent(users):
+    pending = SpendEntry.objects.filter(buyer=OuterRef('pk'), rolled_up=False).values('buyer')
+    return users.annotate(
+        pending_spent=Coalesce(Subquery(pending.annotate(total=Sum('amount')).values('total')), 0)
+    )
+
+
+def reconcile_spend(batch_size=1000):
+    purchased = Purchase.objects.filter(buyer=OuterRef('pk')).values('buyer').annotate(
+        total=Sum(F('amount') * F('price'))
+    ).values('total')
+
+    changed = []
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            users = list(
+                with_pending_spent(User.objects.select_for_update().filter(pk__gt=last_pk).order_by('pk'))
+                .annotate(purchased=Coalesce(Subquery(purchased), 0))
+                .only('id', 'total_spent')[:batch_size]
+            )
+            if not users:
+                return changed
+            batch = []
+            for user in users:
+                expected = user.purchased - user.pending_spent
+                if user.total_spent != expected:
+                    user.total_spent = expected
+                    batch.append(user)
+            User.objects.bulk_update(batch, ['total_spent'])
+        changed += batch
+        last_pk = users[-1].pk
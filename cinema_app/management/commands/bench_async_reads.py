@@ -0,0 +1,136 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time
+from threading import local
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, AsyncClient, override_settings
+from django.urls import reverse
+
+from cinema_app.management.commands.bench_ticket_rush import percentile
+from cinema_app.models import Hall, Film, Session
+from cinema_app.recurrence import ScheduleRule, create_sessions
+
+NAME = 'Async reads'
+SHOWTIMES = [(time(hour), time(hour + 1, 30)) for hour in (10, 12, 14, 16, 18, 20)]
+
+
+def summarize(latencies, duration):
+    return {
+        'requests': len(latencies),
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(len(latencies) / duration, 1) if duration else None,
+        'latency_ms': {
+            name: round(percentile(latencies, pct) * 1000, 2)
+            for name, pct in (('p50', 50), ('p95', 95), ('p99', 99))
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare the sync WSGI and async ASGI read views for the homepage, film detail and seat availability'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--films', type=int, default=20, help='Films showing today, each in its own hall')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per workload and handler')
+        parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight at once')
+        parser.add_argument('--workloads', nargs='+', choices=['homepage', 'detail', 'seats'],
+                            default=['homepage', 'detail', 'seats'])
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def seed(self, films_count):
+        films = []
+        for i in range(films_count):
+            hall = Hall.objects.create(name=f'{NAME} {i}', rows=10, seats_per_row=20)
+            film = Film.objects.create(name=f'{NAME} {i}', description='Benchmark film',
+                                       date_start=date.today(), date_finish=date.today())
+            create_sessions(ScheduleRule(film, hall, 10 + i, SHOWTIMES))
+            films.append(film)
+        return films
+
+    def workloads(self, session):
+        return {
+            'homepage': (reverse('base'), reverse('async_base')),
+            'detail': (
+                reverse('purchase_detail', kwargs={'pk': session.pk}),
+                reverse('async_purchase_detail', kwargs={'pk': session.pk}),
+            ),
+            'seats': (
+                reverse('session-seats', kwargs={'pk': session.pk}),
+                reverse('async-session-seats', kwargs={'pk': session.pk}),
+            ),
+        }
+
+    def run_sync(self, url, options):
+        clients = local()
+
+        def fetch(_):
+            if not hasattr(clients, 'client'):
+                clients.client = Client(raise_request_exception=False)
+            started = perf_counter()
+            response = clients.client.get(url)
+            elapsed = perf_counter() - started
+            if response.status_code != 200:
+                raise RuntimeError(f'{url} returned {response.status_code}')
+            return elapsed
+
+        def close_connection(_):
+            connection.close()
+
+        started = perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            latencies = list(executor.map(fetch, range(options['requests'])))
+            list(executor.map(close_connection, range(options['concurrency'])))
+        return summarize(latencies, perf_counter() - started)
+
+    async def run_async(self, url, options):
+        client = AsyncClient(raise_request_exception=False)
+        in_flight = asyncio.Semaphore(options['concurrency'])
+
+        async def fetch():
+            async with in_flight:
+                started = perf_counter()
+                response = await client.get(url)
+                elapsed = perf_counter() - started
+            if response.status_code != 200:
+                raise RuntimeError(f'{url} returned {response.status_code}')
+            return elapsed
+
+        started = perf_counter()
+        latencies = await asyncio.gather(*(fetch() for _ in range(options['requests'])))
+        return summarize(latencies, perf_counter() - started)
+
+    def handle(self, *args, **options):
+        films = self.seed(options['films'])
+        try:
+            session = Session.objects.filter(film=films[0]).order_by('id').first()
+            report = {
+                'database': connection.vendor,
+                'config': {key: options[key] for key in ('films', 'requests', 'concurrency')},
+                'workloads': {},
+            }
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for name in options['workloads']:
+                    sync_url, async_url = self.workloads(session)[name]
+                    sync_result = self.run_sync(sync_url, options)
+                    async_result = asyncio.run(self.run_async(async_url, options))
+                    report['workloads'][name] = {
+                        'wsgi': sync_result,
+                        'asgi': async_result,
+                        'speedup': round(async_result['throughput_rps'] / sync_result['throughput_rps'], 2),
+                    }
+        finally:
+            Hall.objects.filter(sessions__film__in=films).delete()
+            Film.objects.filter(pk__in=[film.pk for film in films]).delete()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+            self.stdout.write(f'Report written to {options["output"]}')
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,150 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time
+from io import BytesIO
+from threading import local
+from time import perf_counter
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.sessions.models import Session as UserSession
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.core.handlers.wsgi import WSGIHandler
+from django.middleware.csrf import _get_new_csrf_string
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from cinema_app.management.commands.bench_async_reads import summarize
+from cinema_app.management.commands.bench_ticket_rush import QUIET_LOGGERS
+from cinema_app.models import Hall, Film, Session, User
+from cinema_app.pooling import metrics
+
+NAME = 'Pooling'
+
+
+class Command(BaseCommand):
+    help = 'Compare request latency with fresh and persistent database connections on listing and purchase endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and mode')
+        parser.add_argument('--concurrency', type=int, default=8, help='Threads sending requests')
+        parser.add_argument('--max-age', type=int, default=60, help='CONN_MAX_AGE used for the persistent mode')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def seed(self, options):
+        hall = Hall.objects.create(name=NAME, rows=100, seats_per_row=100)
+        film = Film.objects.create(name=NAME, description='Benchmark film',
+                                   date_start=date.today(), date_finish=date.today())
+        session = Session.objects.create(date=date.today(), time_start=time(20), time_end=time(22), price=10,
+                                         rest_of_seats=hall.size, hall=hall, film=film)
+        buyers = [User.objects.create(username=f'pooling-{i}') for i in range(options['concurrency'])]
+        return hall, film, session, buyers
+
+    def set_max_age(self, max_age):
+        for alias in connections:
+            connections.settings[alias]['CONN_MAX_AGE'] = max_age
+
+    def login(self, buyer):
+        client = Client()
+        client.force_login(buyer)
+        self.session_keys.append(client.session.session_key)
+        token = _get_new_csrf_string()
+        return f'{settings.SESSION_COOKIE_NAME}={client.session.session_key}; {settings.CSRF_COOKIE_NAME}={token}', token
+
+    def call(self, handler, url, data, cookie, token):
+        environ = {'PATH_INFO': url, 'HTTP_COOKIE': cookie, 'HTTP_X_CSRFTOKEN': token}
+        if data:
+            body = urlencode(data).encode()
+            environ.update({
+                'REQUEST_METHOD': 'POST',
+                'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+                'CONTENT_LENGTH': str(len(body)),
+                'wsgi.input': BytesIO(body),
+            })
+        setup_testing_defaults(environ)
+
+        statuses = []
+        response = handler(environ, lambda status, headers: statuses.append(int(status.split()[0])))
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        return statuses[0]
+
+    def run(self, url, data, buyers, options):
+        handler = WSGIHandler()
+        credentials = local()
+        logins = iter([self.login(buyer) for buyer in buyers])
+
+        def fetch(_):
+            if not hasattr(credentials, 'cookie'):
+                credentials.cookie, credentials.token = next(logins)
+            started = perf_counter()
+            status = self.call(handler, url, data, credentials.cookie, credentials.token)
+            return perf_counter() - started, status < 300
+
+        def close_connections(_):
+            connections.close_all()
+
+        metrics.reset()
+        started = perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(fetch, range(options['requests'])))
+            list(executor.map(close_connections, range(options['concurrency'])))
+        return {
+            **summarize([elapsed for elapsed, _ in results], perf_counter() - started),
+            'errors': sum(not ok for _, ok in results),
+            'pool': metrics.snapshot(),
+        }
+
+    def handle(self, *args, **options):
+        hall, film, session, buyers = self.seed(options)
+        self.session_keys = []
+        max_ages = {alias: connections.settings[alias].get('CONN_MAX_AGE', 0) for alias in connections}
+        endpoints = {
+            'listing': (reverse('session-list'), None),
+            'purchase': (
+                reverse('purchase-list', kwargs={'session_id': session.pk}), {'amount': 1, 'ticket': session.pk}
+            ),
+        }
+        report = {
+            'database': connections['default'].vendor,
+            'config': {key: options[key] for key in ('requests', 'concurrency', 'max_age')},
+            'endpoints': {},
+        }
+        loggers = [logging.getLogger(name) for name in QUIET_LOGGERS]
+        levels = [logger.level for logger in loggers]
+        for logger in loggers:
+            logger.setLevel(logging.CRITICAL)
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, '127.0.0.1']):
+                for name, (url, data) in endpoints.items():
+                    results = {}
+                    for mode, max_age in (('fresh', 0), ('persistent', options['max_age'])):
+                        self.set_max_age(max_age)
+                        results[mode] = self.run(url, data, buyers, options)
+                    results['speedup'] = round(
+                        results['persistent']['throughput_rps'] / results['fresh']['throughput_rps'], 2
+                    )
+                    report['endpoints'][name] = results
+        finally:
+            for logger, level in zip(loggers, levels):
+                logger.setLevel(level)
+            for alias, max_age in max_ages.items():
+                connections.settings[alias]['CONN_MAX_AGE'] = max_age
+            UserSession.objects.filter(session_key__in=self.session_keys).delete()
+            User.objects.filter(pk__in=[buyer.pk for buyer in buyers]).delete()
+            hall.delete()
+            film.delete()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+            self.stdout.write(f'Report written to {options["output"]}')
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,78 @@
+from datetime import date, time, timedelta
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from cinema_app.API.fast import FastSerializer
+from cinema_app.API.serializers import SessionSerializer
+from cinema_app.models import Hall, Film, Session
+
+SHOWTIMES = [(time(hour), time(hour + 1, 30)) for hour in (10, 12, 14, 16, 18, 20)]
+DAYS = 365
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/second of the DRF and the fast session list serializers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help='Session counts to test')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per serializer, the best one is reported')
+
+    def seed(self, count):
+        film = Film.objects.create(name='Benchmark', description='Benchmark film',
+                                   date_start=date.today(), date_finish=date.today() + timedelta(days=DAYS))
+        halls_needed = -(-count // (DAYS * len(SHOWTIMES)))
+        halls = [Hall.objects.create(name=f'Benchmark {i}', size=100) for i in range(halls_needed)]
+
+        sessions = (
+            Session(date=film.date_start + timedelta(days=day), time_start=time_start, time_end=time_end,
+                    price=10, rest_of_seats=100, hall=hall, film=film)
+            for hall in halls for day in range(DAYS) for time_start, time_end in SHOWTIMES
+        )
+        Session.objects.bulk_create((session for _, session in zip(range(count), sessions)), batch_size=2000)
+        return film
+
+    def measure(self, render, repeat):
+        best, output = None, None
+        for _ in range(repeat):
+            started = perf_counter()
+            output = render()
+            elapsed = perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, output
+
+    def handle(self, *args, **options):
+        fast_serializer = FastSerializer(SessionSerializer)
+
+        for count in options['sizes']:
+            try:
+                with transaction.atomic():
+                    film = self.seed(count)
+                    queryset = Session.objects.filter(film=film).order_by('date', 'time_start', 'id')
+
+                    drf_time, drf_output = self.measure(
+                        lambda: JSONRenderer().render(SessionSerializer(queryset, many=True).data),
+                        options['repeat']
+                    )
+                    fast_time, fast_output = self.measure(
+                        lambda: JSONRenderer().render(fast_serializer.to_representation(
+                            fast_serializer.values(queryset)
+                        )),
+                        options['repeat']
+                    )
+                    if drf_output != fast_output:
+                        raise CommandError(f'Fast serializer output differs at {count} sessions')
+
+                    self.stdout.write(
+                        f'{count} sessions: drf {count / drf_time:,.0f} rows/s, '
+                        f'fast {count / fast_time:,.0f} rows/s, speedup x{drf_time / fast_time:.1f}'
+                    )
+                    raise Rollback
+            except Rollback:
+                pass
@@ -0,0 +1,219 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time
+from threading import Lock, local
+from time import perf_counter
+
+from django.contrib.sessions.models import Session as UserSession
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+from django.db.models import Sum
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from cinema_app.models import Hall, Film, Session, Purchase, SeatHold, User
+
+NAME = 'Ticket rush'
+QUIET_LOGGERS = ('django.request', 'django.db.backends.base')
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))]
+
+
+def is_locking(sql):
+    return 'FOR UPDATE' in sql or sql.startswith('UPDATE "cinema_app_session"')
+
+
+class LockTimer:
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.waits = 0
+        self.seconds = 0.0
+        self.lock = Lock()
+        self.local = local()
+
+    def __call__(self, execute, sql, params, many, context):
+        if not is_locking(sql):
+            return self.execute(execute, sql, params, many, context)
+
+        started = perf_counter()
+        try:
+            return self.execute(execute, sql, params, many, context)
+        finally:
+            elapsed = perf_counter() - started
+            with self.lock:
+                self.seconds += elapsed
+                if elapsed >= self.threshold:
+                    self.waits += 1
+
+    def execute(self, execute, sql, params, many, context):
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError:
+            self.local.failed = True
+            raise
+
+
+class Command(BaseCommand):
+    help = 'Drive concurrent buyers through the purchase flow of one premiere and report latency and oversell'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=1000, help='Number of concurrent buyers')
+        parser.add_argument('--workers', type=int, default=32, help='Threads sending requests')
+        parser.add_argument('--amount', type=int, default=2, help='Tickets each buyer asks for')
+        parser.add_argument('--sessions', type=int, default=1, help='Sessions the buyers are spread over')
+        parser.add_argument('--rows', type=int, default=10, help='Rows in each hall')
+        parser.add_argument('--seats-per-row', type=int, default=20, help='Seats in each row')
+        parser.add_argument('--target', choices=['api', 'view'], default='api',
+                            help='Buy through the API purchase endpoint or the hold and confirm views')
+        parser.add_argument('--lock-threshold', type=float, default=10,
+                            help='Milliseconds a locking statement may take before it counts as a lock wait')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded data after the run')
+
+    def seed(self, options):
+        film = Film.objects.create(name=NAME, description='Benchmark premiere',
+                                   date_start=date.today(), date_finish=date.today())
+        sessions = []
+        for i in range(options['sessions']):
+            hall = Hall.objects.create(name=f'{NAME} {i}', rows=options['rows'], seats_per_row=options['seats_per_row'])
+            session = Session.objects.create(date=date.today(), time_start=time(20), time_end=time(22), price=10,
+                                             rest_of_seats=hall.size, hall=hall, film=film)
+            sessions.append(session)
+
+        prefix = f'rush-{timezone.now():%Y%m%d%H%M%S}-'
+        User.objects.bulk_create(User(username=f'{prefix}{i}') for i in range(options['buyers']))
+        buyers = list(User.objects.filter(username__startswith=prefix).order_by('id'))
+        return film, sessions, buyers
+
+    def api_purchase(self, client, session, amount):
+        response = client.post(reverse('purchase-list', kwargs={'session_id': session.pk}),
+                               {'amount': amount, 'ticket': session.pk})
+        return response.status_code
+
+    def view_purchase(self, client, session, amount):
+        response = client.post(reverse('purchase_create', kwargs={'session_id': session.pk}), {'amount': amount})
+        if response.status_code != 302 or response.url == '/':
+            return response.status_code if response.status_code != 302 else 400
+        response = client.post(response.url, {'action': 'confirm'})
+        if response.status_code == 302:
+            return 201 if response.url == reverse('cart') else 400
+        return response.status_code
+
+    def run(self, clients, sessions, options):
+        purchase = self.api_purchase if options['target'] == 'api' else self.view_purchase
+        timer = LockTimer(options['lock_threshold'] / 1000)
+        latencies, outcomes = [], {'sold': 0, 'sold_out': 0, 'lock_errors': 0, 'errors': 0}
+        results_lock = Lock()
+
+        def buy(index):
+            client, session = clients[index], sessions[index % len(sessions)]
+            timer.local.failed = False
+            started = perf_counter()
+            with connection.execute_wrapper(timer):
+                status = purchase(client, session, options['amount'])
+            elapsed = perf_counter() - started
+
+            if status == 201:
+                outcome = 'sold'
+            elif status == 400:
+                outcome = 'sold_out'
+            else:
+                outcome = 'lock_errors' if timer.local.failed else 'errors'
+            with results_lock:
+                latencies.append(elapsed)
+                outcomes[outcome] += 1
+
+        def close_connection(_):
+            connection.close()
+
+        loggers = [logging.getLogger(name) for name in QUIET_LOGGERS]
+        levels = [logger.level for logger in loggers]
+        for logger in loggers:
+            logger.setLevel(logging.CRITICAL)
+        started = perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                list(executor.map(buy, range(len(clients))))
+                list(executor.map(close_connection, range(options['workers'])))
+        finally:
+            for logger, level in zip(loggers, levels):
+                logger.setLevel(level)
+        duration = perf_counter() - started
+
+        return {
+            'requests': len(latencies),
+            **outcomes,
+            'duration_s': round(duration, 3),
+            'throughput_rps': round(len(latencies) / duration, 1) if duration else None,
+            'latency_ms': {
+                name: round(percentile(latencies, pct) * 1000, 2) if latencies else None
+                for name, pct in (('p50', 50), ('p95', 95), ('p99', 99), ('max', 100))
+            },
+            'lock_waits': timer.waits,
+            'lock_wait_s': round(timer.seconds, 3),
+        }
+
+    def check_oversell(self, sessions):
+        report = []
+        for session in Session.objects.filter(pk__in=[s.pk for s in sessions]).select_related('hall').order_by('pk'):
+            purchases = list(Purchase.objects.filter(ticket=session).values_list('seats', flat=True))
+            held = SeatHold.objects.filter(session=session).aggregate(amount=Sum('amount'))['amount'] or 0
+            seats = [(seat['row'], seat['seat']) for purchase_seats in purchases for seat in purchase_seats]
+            sold = len(seats)
+            report.append({
+                'session': session.pk,
+                'capacity': session.hall.size,
+                'sold': sold,
+                'held': held,
+                'oversold': max(0, sold + held - session.hall.size),
+                'duplicate_seats': sold - len(set(seats)),
+                'seat_map_taken': session.get_seat_map().taken_count(),
+                'rest_of_seats': session.rest_of_seats,
+            })
+        return report
+
+    def handle(self, *args, **options):
+        started_at = timezone.now()
+        film, sessions, buyers = self.seed(options)
+        clients, session_keys = [], []
+        try:
+            for buyer in buyers:
+                client = Client(raise_request_exception=False, SERVER_NAME='localhost')
+                client.force_login(buyer)
+                clients.append(client)
+                session_keys.append(client.session.session_key)
+
+            results = self.run(clients, sessions, options)
+            oversell = self.check_oversell(sessions)
+        finally:
+            if not options['keep']:
+                UserSession.objects.filter(session_key__in=session_keys).delete()
+                User.objects.filter(pk__in=[buyer.pk for buyer in buyers]).delete()
+                Hall.objects.filter(sessions__film=film).delete()
+                film.delete()
+
+        report = {
+            'started_at': started_at.isoformat(),
+            'database': connection.vendor,
+            'config': {key: options[key] for key in (
+                'buyers', 'workers', 'amount', 'sessions', 'rows', 'seats_per_row', 'target', 'lock_threshold'
+            )},
+            'results': results,
+            'sessions': oversell,
+            'oversold': sum(session['oversold'] + session['duplicate_seats'] for session in oversell),
+        }
+        output = json.dumps(report, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+            self.stdout.write(f'Report written to {options["output"]}')
+        else:
+            self.stdout.write(output)
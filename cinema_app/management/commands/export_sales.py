@@ -0,0 +1,35 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from cinema_app.exports import EXPORT_CHUNK_SIZE, FORMATS, export_sales
+
+
+class Command(BaseCommand):
+    help = 'Stream every purchase with its session, film, hall and buyer as CSV or JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv', help='Output format')
+        parser.add_argument('--from', dest='date_from', type=date.fromisoformat, help='First session date, yyyy-mm-dd')
+        parser.add_argument('--to', dest='date_to', type=date.fromisoformat, help='Last session date, yyyy-mm-dd')
+        parser.add_argument('--film', type=int, help='Only purchases for this film id')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Rows fetched per database round trip')
+        parser.add_argument('--output', help='Write the export to this file instead of stdout')
+
+    def export(self, write, options):
+        lines = export_sales(options['format'], options['chunk_size'], date_from=options['date_from'],
+                             date_to=options['date_to'], film=options['film'])
+        rows = -1 if options['format'] == 'csv' else 0
+        for line in lines:
+            write(line)
+            rows += 1
+        return rows
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            self.export(lambda line: self.stdout.write(line, ending=''), options)
+            return
+
+        with open(options['output'], 'w', newline='', encoding='utf-8') as file:
+            rows = self.export(file.write, options)
+        self.stderr.write(f'Exported {rows} purchases to {options["output"]}')
@@ -0,0 +1,37 @@
+import json
+import sys
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cinema_app.importer import FORMATS, IMPORT_CHUNK_SIZE, detect_format, import_schedule
+
+
+class Command(BaseCommand):
+    help = 'Stream films, halls and showtimes from a CSV or JSONL file into the schedule'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or - to read from stdin')
+        parser.add_argument('--format', choices=FORMATS, help='File format, guessed from the extension by default')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help='Rows written per transaction')
+
+    def report_error(self, line, message):
+        self.stderr.write(f'Line {line}: {message}')
+
+    def handle(self, *args, **options):
+        format = options['format'] or detect_format(options['path'])
+        started = perf_counter()
+        try:
+            if options['path'] == '-':
+                summary = import_schedule(sys.stdin, format, chunk_size=options['chunk_size'],
+                                          on_error=self.report_error)
+            else:
+                with open(options['path'], newline='', encoding='utf-8') as file:
+                    summary = import_schedule(file, format, chunk_size=options['chunk_size'],
+                                              on_error=self.report_error)
+        except OSError as error:
+            raise CommandError(error)
+
+        summary.pop('errors')
+        summary['duration_s'] = round(perf_counter() - started, 3)
+        self.stdout.write(json.dumps(summary, indent=2))
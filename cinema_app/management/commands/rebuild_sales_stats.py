@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from cinema_app.analytics import rebuild_sales_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the session, film and hall sales summaries from every purchase'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Summary rows per insert')
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_sales_stats(batch_size=options['batch_size'])
+        self.stdout.write(
+            f'Rebuilt {rebuilt["sessions"]} session, {rebuilt["film_days"]} film-day '
+            f'and {rebuilt["hall_days"]} hall-day summaries'
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from cinema_app.ledger import reconcile_spend
+
+
+class Command(BaseCommand):
+    help = 'Recompute User.total_spent from the prices paid on Purchase'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users per transaction')
+
+    def handle(self, *args, **options):
+        changed = reconcile_spend(batch_size=options['batch_size'])
+        for user in changed:
+            self.stdout.write(f'{user.pk}: total_spent set to {user.total_spent}')
+        self.stdout.write(f'Reconciled {len(changed)} users')
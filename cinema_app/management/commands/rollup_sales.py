@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from cinema_app.analytics import roll_up_sales
+
+
+class Command(BaseCommand):
+    help = 'Fold purchases not yet counted into the session, film and hall sales summaries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Purchases per transaction')
+
+    def handle(self, *args, **options):
+        rolled_up = roll_up_sales(batch_size=options['batch_size'])
+        self.stdout.write(f'Rolled up {rolled_up} purchases')
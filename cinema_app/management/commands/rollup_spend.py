@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from cinema_app.ledger import roll_up_spend
+
+
+class Command(BaseCommand):
+    help = 'Fold pending spend ledger entries into User.total_spent'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Ledger entries per transaction')
+
+    def handle(self, *args, **options):
+        rolled_up = roll_up_spend(batch_size=options['batch_size'])
+        self.stdout.write(f'Rolled up {rolled_up} ledger entries')
@@ -0,0 +1,23 @@
+from time import sleep
+
+from django.core.management.base import BaseCommand
+
+from cinema_app.purchases import sweep_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Release seats held by expired reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping until interrupted')
+        parser.add_argument('--interval', type=float, default=15, help='Seconds between sweeps with --loop')
+        parser.add_argument('--batch-size', type=int, default=500, help='Sessions released per transaction')
+
+    def handle(self, *args, **options):
+        while True:
+            released = sweep_expired_holds(batch_size=options['batch_size'])
+            if released or not options['loop']:
+                self.stdout.write(f'Released {released} expired holds')
+            if not options['loop']:
+                return
+            sleep(options['interval'])
@@ -1,16 +1,285 @@
+from collections import Counter
+from contextlib import ExitStack
+from random import random
+from time import time, perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
 from django.contrib.auth import logout
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
 from django.utils.deprecation import MiddlewareMixin
-from datetime import datetime
+
+from cinema_app import pooling
+from cinema_app.routers import replica_reads, wrote
+
+INACTIVE_USER_TIMEOUT = getattr(settings, 'INACTIVE_USER_TIMEOUT', 1800)
+INACTIVE_USER_WRITE_GRANULARITY = getattr(settings, 'INACTIVE_USER_WRITE_GRANULARITY', 60)
+API_PREFIX = '/api/'
+REPLICA_STICKY_SECONDS = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+REPLICA_STICKY_COOKIE = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PROFILER_SAMPLE_RATE = getattr(settings, 'PROFILER_SAMPLE_RATE', 0)
+PROFILER_SLOW_REQUEST_MS = getattr(settings, 'PROFILER_SLOW_REQUEST_MS', 500)
+PROFILER_SLOWEST_STATEMENTS = getattr(settings, 'PROFILER_SLOWEST_STATEMENTS', 5)
+PROFILER_RECENT_SLOW = getattr(settings, 'PROFILER_RECENT_SLOW', 100)
+PROFILER_SLOW_TIMEOUT = getattr(settings, 'PROFILER_SLOW_TIMEOUT', 86400)
+SLOW_REQUESTS_COUNTER = 'profiler:slow:next'
 
 
 class LogoutInactiveUserMiddleware(MiddlewareMixin):
     def process_request(self, request):
-        if request.user.is_superuser:
+        if request.path.startswith(API_PREFIX) or 'HTTP_AUTHORIZATION' in request.META:
+            return
+        if not request.user.is_authenticated or request.user.is_superuser:
             return
-        now = datetime.now()
-        last_action_not_decoded = request.session.get('last_action')
-        if last_action_not_decoded:
-            last_action = datetime.strptime(last_action_not_decoded, "%H-%M-%S %d/%m/%y")
-            if (now - last_action).seconds > 60:
+
+        now = int(time())
+        last_action = request.session.get('last_action')
+        if isinstance(last_action, int):
+            if now - last_action > INACTIVE_USER_TIMEOUT:
                 logout(request)
-        request.session['last_action'] = datetime.now().strftime("%H-%M-%S %d/%m/%y")
\ No newline at end of file
+                return
+            if now - last_action < INACTIVE_USER_WRITE_GRANULARITY:
+                return
+        request.session['last_action'] = now
+
+
+def _slow_request_key(slot):
+    return f'profiler:slow:{slot}'
+
+
+def add_slow_request(entry):
+    cache.add(SLOW_REQUESTS_COUNTER, 0, None)
+    index = cache.incr(SLOW_REQUESTS_COUNTER)
+    cache.set(_slow_request_key(index % PROFILER_RECENT_SLOW), (index, entry), PROFILER_SLOW_TIMEOUT)
+
+
+def recent_slow_requests():
+    slots = cache.get_many([_slow_request_key(slot) for slot in range(PROFILER_RECENT_SLOW)])
+    return [entry for _, entry in sorted(slots.values(), key=lambda slot: slot[0], reverse=True)]
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.statements.append((sql, perf_counter() - started))
+
+    @property
+    def db_time(self):
+        return sum(duration for _, duration in self.statements)
+
+    def slowest(self, count):
+        return sorted(self.statements, key=lambda statement: statement[1], reverse=True)[:count]
+
+    def duplicates(self):
+        counts = Counter(sql for sql, _ in self.statements)
+        return {sql: count for sql, count in counts.most_common() if count > 1}
+
+
+class RequestProfilerMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        return PROFILER_SAMPLE_RATE and random() < PROFILER_SAMPLE_RATE
+
+    def record_queries(self, recorder):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    def finish(self, request, response, total, recorder=None):
+        duplicates = None
+        if recorder is not None:
+            db_time = recorder.db_time
+            duplicates = recorder.duplicates()
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={db_time * 1000:.1f};desc="{len(recorder.statements)} queries"',
+                f'dup;desc="{sum(duplicates.values()) - len(duplicates)} duplicate queries"',
+                f'app;dur={(total - db_time) * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ])
+        if total * 1000 >= PROFILER_SLOW_REQUEST_MS:
+            self.record(request, response, total, recorder, duplicates)
+        return response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        recorder = QueryRecorder() if self.sampled() else None
+        started = perf_counter()
+        if recorder is None:
+            response = self.get_response(request)
+        else:
+            with self.record_queries(recorder):
+                response = self.get_response(request)
+        return self.finish(request, response, perf_counter() - started, recorder)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder() if self.sampled() else None
+        started = perf_counter()
+        if recorder is None:
+            response = await self.get_response(request)
+        else:
+            # The ORM runs on the request's sync thread, which has its own connections.
+            stack = await sync_to_async(self.record_queries)(recorder)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        return self.finish(request, response, perf_counter() - started, recorder)
+
+    def record(self, request, response, total, recorder=None, duplicates=None):
+        entry = {
+            'at': time(),
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'sampled': recorder is not None,
+        }
+        if recorder is not None:
+            entry.update({
+                'queries': len(recorder.statements),
+                'db_ms': round(recorder.db_time * 1000, 1),
+                'slowest': [
+                    {'sql': sql, 'ms': round(duration * 1000, 2)}
+                    for sql, duration in recorder.slowest(PROFILER_SLOWEST_STATEMENTS)
+                ],
+                'duplicates': [{'sql': sql, 'count': count} for sql, count in duplicates.items()],
+            })
+        add_slow_request(entry)
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def use_replica(self, request):
+        if request.method not in SAFE_METHODS:
+            return False
+        primary_until = request.COOKIES.get(REPLICA_STICKY_COOKIE, '')
+        return not (primary_until.isdigit() and int(primary_until) > time())
+
+    def stick(self, request, response):
+        if wrote() or request.method not in SAFE_METHODS:
+            response.set_cookie(
+                REPLICA_STICKY_COOKIE, str(int(time()) + REPLICA_STICKY_SECONDS),
+                max_age=REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax'
+            )
+        return response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        with replica_reads(self.use_replica(request)):
+            return self.stick(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        with replica_reads(self.use_replica(request)):
+            return self.stick(request, await self.get_response(request))
+
+
+class PooledContent:
+    def __init__(self, content):
+        self.content = content
+        self.released = False
+
+    def close(self):
+        if not self.released:
+            self.released = True
+            pooling.checkin()
+
+
+class ReleaseOnClose(PooledContent):
+    def __iter__(self):
+        try:
+            yield from self.content
+        finally:
+            self.close()
+
+
+class AsyncReleaseOnClose(PooledContent):
+    async def __aiter__(self):
+        try:
+            async for chunk in self.content:
+                yield chunk
+        finally:
+            await sync_to_async(self.close)()
+
+
+def pool_busy():
+    response = HttpResponse('The cinema is busy, please try again in a moment.', status=503)
+    response['Retry-After'] = '1'
+    return response
+
+
+class ConnectionPoolMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def release(self, response):
+        if not response.streaming:
+            pooling.checkin()
+        elif response.is_async:
+            response.streaming_content = AsyncReleaseOnClose(response.streaming_content)
+        else:
+            response.streaming_content = ReleaseOnClose(response.streaming_content)
+        return response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        try:
+            pooling.checkout()
+        except pooling.PoolExhausted:
+            return pool_busy()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            pooling.checkin()
+            raise
+        return self.release(response)
+
+    async def __acall__(self, request):
+        # Checkout and checkin run on the request's sync thread, where the ORM keeps its connections.
+        try:
+            await sync_to_async(pooling.checkout)()
+        except pooling.PoolExhausted:
+            return pool_busy()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            await sync_to_async(pooling.checkin)()
+            raise
+        return await sync_to_async(self.release)(response)
@@ -0,0 +1,93 @@
+# Generated by Django 4.2.2 on 2026-10-18 18:01
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Exists, F, OuterRef
+
+POSTGRES_CONSTRAINT = """
+SET CONSTRAINTS ALL IMMEDIATE;
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+ALTER TABLE cinema_app_session ADD CONSTRAINT session_hall_no_overlap EXCLUDE USING gist (
+    hall_id WITH =,
+    tsrange(date + time_start, date + time_end, '[)') WITH &&
+) WHERE (date IS NOT NULL);
+"""
+
+POSTGRES_CONSTRAINT_REVERSE = """
+ALTER TABLE cinema_app_session DROP CONSTRAINT IF EXISTS session_hall_no_overlap;
+"""
+
+
+def overlapping_sessions(Session):
+    return Session.objects.exclude(date=None).filter(Exists(
+        Session.objects.filter(
+            hall_id=OuterRef('hall_id'),
+            date=OuterRef('date'),
+            time_start__lt=OuterRef('time_end'),
+            time_end__gt=OuterRef('time_start')
+        ).exclude(pk=OuterRef('pk'))
+    ))
+
+
+def resolve_overlapping_sessions(apps, schema_editor):
+    Session = apps.get_model('cinema_app', 'Session')
+    Purchase = apps.get_model('cinema_app', 'Purchase')
+
+    duplicates = defaultdict(list)
+    sold = set()
+    candidates = overlapping_sessions(Session).annotate(
+        sold=Exists(Purchase.objects.filter(ticket_id=OuterRef('pk')))
+    ).order_by('id').values_list('id', 'hall_id', 'date', 'time_start', 'time_end', 'film_id', 'price', 'sold')
+    for pk, *key, is_sold in candidates:
+        duplicates[tuple(key)].append(pk)
+        if is_sold:
+            sold.add(pk)
+
+    redundant = []
+    for pks in duplicates.values():
+        keep = next((pk for pk in pks if pk in sold), pks[0])
+        redundant += [pk for pk in pks if pk != keep and pk not in sold]
+    Session.objects.filter(pk__in=redundant).delete()
+
+    remaining = list(
+        overlapping_sessions(Session).order_by('hall_id', 'date', 'time_start', 'id')
+        .values_list('id', 'hall_id', 'date', 'time_start', 'time_end')
+    ) + list(
+        Session.objects.exclude(date=None).filter(time_end__lt=F('time_start')).order_by('id')
+        .values_list('id', 'hall_id', 'date', 'time_start', 'time_end')
+    )
+    if remaining:
+        raise ValueError(
+            'Cannot add session_hall_no_overlap, these sessions overlap another session in the same hall '
+            'or end before they start. Move or delete them and migrate again:\n' + '\n'.join(
+                f'  session {pk}: hall {hall_id}, {date} {time_start}-{time_end}'
+                for pk, hall_id, date, time_start, time_end in remaining
+            )
+        )
+
+
+def add_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_CONSTRAINT)
+
+
+def remove_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_CONSTRAINT_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['hall', 'date', 'time_start'], name='session_hall_date_idx'),
+        ),
+        migrations.RunPython(resolve_overlapping_sessions, migrations.RunPython.noop),
+        migrations.RunPython(add_overlap_constraint, remove_overlap_constraint),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.2 on 2026-10-18 18:04
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_seat_maps(apps, schema_editor):
+    Hall = apps.get_model('cinema_app', 'Hall')
+    Session = apps.get_model('cinema_app', 'Session')
+
+    Hall.objects.update(rows=1, seats_per_row=F('size'))
+
+    sessions = Session.objects.select_related('hall').filter(rest_of_seats__lt=F('hall__size'))
+    for session in sessions.iterator():
+        sold = session.hall.size - session.rest_of_seats
+        session.seat_map = ((1 << sold) - 1).to_bytes((session.hall.size + 7) // 8, 'little')
+        session.save(update_fields=['seat_map'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema_app', '0002_session_hall_conflicts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hall',
+            name='rows',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='hall',
+            name='seats_per_row',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='seats',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='seat_map',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(fill_seat_maps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.2 on 2026-10-18 18:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema_app', '0003_seat_maps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField()),
+                ('seats', models.JSONField(default=list)),
+                ('expires_at', models.DateTimeField()),
+                ('buyer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to=settings.AUTH_USER_MODEL)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='cinema_app.session')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at', 'session'], name='seathold_expiry_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.2 on 2026-10-18 18:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema_app', '0004_seat_holds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField()),
+                ('rolled_up', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('buyer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spend_entries', to=settings.AUTH_USER_MODEL)),
+                ('purchase', models.OneToOneField(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='spend_entry', to='cinema_app.purchase')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('rolled_up', False)), fields=['buyer'], name='spendentry_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema_app', '0005_spend_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['buyer', '-id'], name='purchase_buyer_idx'),
+        ),
+    ]
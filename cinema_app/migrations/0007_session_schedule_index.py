@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-18 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema_app', '0006_purchase_buyer_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['date', 'time_start', 'id'], name='session_schedule_idx'),
+        ),
+    ]
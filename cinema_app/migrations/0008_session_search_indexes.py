@@ -0,0 +1,21 @@
+# Generated by Django 4.2.2 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema_app', '0007_session_schedule_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['film', 'date', 'time_start'], name='session_film_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['date', 'price'], name='session_date_price_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-18 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema_app', '0008_session_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='seats_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.2 on 2026-10-18 18:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema_app', '0009_session_seats_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilmDayStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('tickets', models.PositiveIntegerField(default=0)),
+                ('revenue', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HallDayStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('sessions', models.PositiveIntegerField(default=0)),
+                ('capacity', models.PositiveIntegerField(default=0)),
+                ('tickets', models.PositiveIntegerField(default=0)),
+                ('revenue', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SessionStats',
+            fields=[
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='cinema_app.session')),
+                ('tickets', models.PositiveIntegerField(default=0)),
+                ('revenue', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='counted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(condition=models.Q(('counted', False)), fields=['id'], name='purchase_uncounted_idx'),
+        ),
+        migrations.AddField(
+            model_name='halldaystats',
+            name='hall',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_stats', to='cinema_app.hall'),
+        ),
+        migrations.AddField(
+            model_name='filmdaystats',
+            name='film',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_stats', to='cinema_app.film'),
+        ),
+        migrations.AddIndex(
+            model_name='halldaystats',
+            index=models.Index(fields=['date', 'id'], name='halldaystats_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='halldaystats',
+            constraint=models.UniqueConstraint(fields=('hall', 'date'), name='halldaystats_hall_date_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='filmdaystats',
+            index=models.Index(fields=['date', 'id'], name='filmdaystats_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='filmdaystats',
+            constraint=models.UniqueConstraint(fields=('film', 'date'), name='filmdaystats_film_date_unique'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_session_prices(apps, schema_editor):
+    Purchase = apps.get_model('cinema_app', 'Purchase')
+    Session = apps.get_model('cinema_app', 'Session')
+    Purchase.objects.update(price=Subquery(Session.objects.filter(pk=OuterRef('ticket_id')).values('price')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema_app', '0010_sales_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchase',
+            name='price',
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_session_prices, migrations.RunPython.noop),
+    ]
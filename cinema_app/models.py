@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from cinema_app.seatmap import SeatMap
+
 
 class User(AbstractUser):
     total_spent = models.PositiveIntegerField(default=0)
@@ -12,6 +14,20 @@ class User(AbstractUser):
 class Hall(models.Model):
     name = models.CharField(max_length=50)
     size = models.PositiveIntegerField()
+    rows = models.PositiveIntegerField(default=1)
+    seats_per_row = models.PositiveIntegerField(default=0)
+
+    def save(self, *args, **kwargs):
+        if self.seats_per_row:
+            self.size = self.rows * self.seats_per_row
+        else:
+            self.rows, self.seats_per_row = 1, self.size
+        super().save(*args, **kwargs)
+
+    def layout_locked(self, rows, seats_per_row):
+        if self.pk is None or (rows, seats_per_row) == (self.rows, self.seats_per_row):
+            return False
+        return self.sessions.exists()
 
     def __str__(self):
         return f'{self.name} Size: {self.size}'
@@ -33,17 +49,118 @@ class Session(models.Model):
     time_end = models.TimeField()
     price = models.PositiveIntegerField()
     rest_of_seats = models.PositiveIntegerField()
+    seat_map = models.BinaryField(default=b'')
+    seats_version = models.PositiveBigIntegerField(default=0)
     hall = models.ForeignKey(Hall, on_delete=models.CASCADE, related_name='sessions')
     film = models.ForeignKey(Film, on_delete=models.CASCADE, related_name='session')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['hall', 'date', 'time_start'], name='session_hall_date_idx'),
+            models.Index(fields=['date', 'time_start', 'id'], name='session_schedule_idx'),
+            models.Index(fields=['film', 'date', 'time_start'], name='session_film_date_idx'),
+            models.Index(fields=['date', 'price'], name='session_date_price_idx'),
+        ]
+
+    def get_seat_map(self):
+        return SeatMap(self.hall.rows, self.hall.seats_per_row, self.seat_map)
+
     def __str__(self):
         return f' {self.film}'
 
 
 class Purchase(models.Model):
     amount = models.PositiveIntegerField()
+    price = models.PositiveIntegerField()
+    seats = models.JSONField(default=list)
     ticket = models.ForeignKey(Session, on_delete=models.CASCADE)
     buyer = models.ForeignKey(User, on_delete=models.CASCADE)
+    counted = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['buyer', '-id'], name='purchase_buyer_idx'),
+            models.Index(fields=['id'], condition=models.Q(counted=False), name='purchase_uncounted_idx'),
+        ]
 
     def __str__(self):
         return f'Amount: {self.amount} by {self.buyer}'
+
+
+class SeatHold(models.Model):
+    amount = models.PositiveIntegerField()
+    seats = models.JSONField(default=list)
+    session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='holds')
+    buyer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='holds')
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at', 'session'], name='seathold_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f'Hold: {self.amount} by {self.buyer} until {self.expires_at}'
+
+
+class SpendEntry(models.Model):
+    amount = models.PositiveIntegerField()
+    buyer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='spend_entries')
+    purchase = models.OneToOneField(Purchase, on_delete=models.SET_NULL, null=True, related_name='spend_entry')
+    rolled_up = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['buyer'], condition=models.Q(rolled_up=False), name='spendentry_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f'Spent: {self.amount} by {self.buyer}'
+
+
+class SessionStats(models.Model):
+    session = models.OneToOneField(Session, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    tickets = models.PositiveIntegerField(default=0)
+    revenue = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.session}: {self.tickets} tickets'
+
+
+class FilmDayStats(models.Model):
+    film = models.ForeignKey(Film, on_delete=models.CASCADE, related_name='day_stats')
+    date = models.DateField()
+    tickets = models.PositiveIntegerField(default=0)
+    revenue = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['film', 'date'], name='filmdaystats_film_date_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'id'], name='filmdaystats_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.film} {self.date}: {self.revenue}'
+
+
+class HallDayStats(models.Model):
+    hall = models.ForeignKey(Hall, on_delete=models.CASCADE, related_name='day_stats')
+    date = models.DateField()
+    sessions = models.PositiveIntegerField(default=0)
+    capacity = models.PositiveIntegerField(default=0)
+    tickets = models.PositiveIntegerField(default=0)
+    revenue = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['hall', 'date'], name='halldaystats_hall_date_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'id'], name='halldaystats_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.hall.name} {self.date}: {self.tickets}/{self.capacity}'
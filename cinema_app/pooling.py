@@ -0,0 +1,76 @@
+from threading import BoundedSemaphore, Lock
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+DB_POOL_MAX_SIZE = getattr(settings, 'DB_POOL_MAX_SIZE', 0)
+DB_POOL_TIMEOUT = getattr(settings, 'DB_POOL_TIMEOUT', 5)
+COUNTERS = ('checkouts', 'reused', 'new_connections', 'waits', 'timeouts', 'discarded')
+
+
+class PoolExhausted(Exception):
+    pass
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters = dict.fromkeys(COUNTERS, 0)
+            self.wait_seconds = 0.0
+            self.in_use = 0
+
+    def add(self, name, count=1):
+        with self.lock:
+            self.counters[name] += count
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                **self.counters,
+                'wait_seconds': round(self.wait_seconds, 3),
+                'in_use': self.in_use,
+                'max_size': DB_POOL_MAX_SIZE,
+            }
+
+
+metrics = PoolMetrics()
+slots = BoundedSemaphore(DB_POOL_MAX_SIZE) if DB_POOL_MAX_SIZE else None
+
+
+def checkout():
+    if slots is not None:
+        if not slots.acquire(blocking=False):
+            started = perf_counter()
+            acquired = slots.acquire(timeout=DB_POOL_TIMEOUT)
+            with metrics.lock:
+                metrics.counters['waits'] += 1
+                metrics.wait_seconds += perf_counter() - started
+            if not acquired:
+                metrics.add('timeouts')
+                raise PoolExhausted(f'No database connection became free within {DB_POOL_TIMEOUT}s.')
+
+    with metrics.lock:
+        metrics.counters['checkouts'] += 1
+        metrics.in_use += 1
+        if any(connection.connection is not None for connection in connections.all(initialized_only=True)):
+            metrics.counters['reused'] += 1
+
+
+def discard_broken():
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is not None and connection.errors_occurred and not connection.is_usable():
+            connection.close()
+            metrics.add('discarded')
+
+
+def checkin():
+    discard_broken()
+    with metrics.lock:
+        metrics.in_use -= 1
+    if slots is not None:
+        slots.release()
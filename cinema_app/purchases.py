@@ -0,0 +1,188 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+
+from cinema_app import schedule, versions
+from cinema_app.analytics import record_sales
+from cinema_app.ledger import record_spend, record_group_spend
+from cinema_app.models import Session, Purchase, SeatHold
+
+SEAT_HOLD_TTL = getattr(settings, 'SEAT_HOLD_TTL', 600)
+
+
+class SoldOut(Exception):
+    pass
+
+
+class HoldExpired(Exception):
+    pass
+
+
+def _seats_to_json(seats):
+    return [{'row': row, 'seat': seat} for row, seat in seats]
+
+
+def _seats_from_json(seats):
+    return [(seat['row'], seat['seat']) for seat in seats]
+
+
+def _patch_schedule(session, delta):
+    transaction.on_commit(lambda: schedule.patch_session_seats(session.id, delta))
+    transaction.on_commit(lambda: versions.bump('session'))
+
+
+def _take(seat_map, amount, seats=None):
+    if seats:
+        if not seat_map.is_free(seats):
+            raise SoldOut('Some of the selected seats are already taken.')
+    else:
+        seats = seat_map.pick(amount)
+        if seats is None:
+            raise SoldOut(f'Only {seat_map.free_count()} seats left for this session.')
+
+    seat_map.take(seats)
+    return seats
+
+
+def _reserve(session, amount, seats=None):
+    sessions = Session.objects.using(router.db_for_write(Session)).select_related('hall')
+    while True:
+        current = sessions.get(pk=session.pk)
+        seat_map = current.get_seat_map()
+        taken = _take(seat_map, amount, seats)
+        if Session.objects.filter(pk=session.pk, seats_version=current.seats_version).update(
+                seat_map=seat_map.to_bytes(), rest_of_seats=seat_map.free_count(),
+                seats_version=current.seats_version + 1
+        ):
+            break
+
+    session.price = current.price
+    session.seat_map = seat_map.to_bytes()
+    session.rest_of_seats = seat_map.free_count()
+    session.seats_version = current.seats_version + 1
+    _patch_schedule(session, -len(taken))
+    return taken
+
+
+def _sell(session, buyer, seats):
+    purchase = Purchase.objects.create(
+        amount=len(seats), price=session.price, seats=_seats_to_json(seats), ticket=session, buyer=buyer
+    )
+    record_spend(purchase, session.price * len(seats))
+    record_sales([purchase])
+    return purchase
+
+
+def buy_tickets(session, buyer, amount, seats=None):
+    with transaction.atomic():
+        seats = _reserve(session, amount, seats)
+        return _sell(session, buyer, seats)
+
+
+def hold_seats(session, buyer, amount, seats=None, ttl=SEAT_HOLD_TTL):
+    with transaction.atomic():
+        seats = _reserve(session, amount, seats)
+        return SeatHold.objects.create(
+            amount=len(seats),
+            seats=_seats_to_json(seats),
+            session=session,
+            buyer=buyer,
+            expires_at=timezone.now() + timedelta(seconds=ttl)
+        )
+
+
+def _lock_sessions(session_ids):
+    return list(
+        Session.objects.select_for_update(of=('self',)).select_related('hall')
+        .filter(pk__in=session_ids).order_by('pk')
+    )
+
+
+def buy_group(buyer, lines):
+    with transaction.atomic():
+        sessions = {session.pk: session for session in _lock_sessions({line[0] for line in lines})}
+        seat_maps = {pk: session.get_seat_map() for pk, session in sessions.items()}
+
+        purchases = []
+        for session_id, amount, seats in lines:
+            if session_id not in sessions:
+                raise SoldOut(f'Session {session_id} does not exist.')
+            seats = _take(seat_maps[session_id], amount, seats)
+            purchases.append(
+                Purchase(amount=len(seats), price=sessions[session_id].price, seats=_seats_to_json(seats),
+                         ticket=sessions[session_id], buyer=buyer)
+            )
+
+        for pk, session in sessions.items():
+            _patch_schedule(session, seat_maps[pk].free_count() - session.rest_of_seats)
+            session.seat_map = seat_maps[pk].to_bytes()
+            session.rest_of_seats = seat_maps[pk].free_count()
+            session.seats_version += 1
+
+        Session.objects.bulk_update(list(sessions.values()), ['seat_map', 'rest_of_seats', 'seats_version'])
+        purchases = Purchase.objects.bulk_create(purchases)
+        record_group_spend(buyer, sum(purchase.amount * purchase.price for purchase in purchases))
+        record_sales(purchases)
+        return purchases
+
+
+def confirm_hold(hold):
+    with transaction.atomic():
+        _lock_sessions([hold.session_id])
+        hold = SeatHold.objects.select_related('session', 'buyer').filter(
+            pk=hold.pk, expires_at__gt=timezone.now()
+        ).first()
+        if hold is None:
+            raise HoldExpired('Your reservation has expired.')
+
+        purchase = _sell(hold.session, hold.buyer, _seats_from_json(hold.seats))
+        hold.delete()
+        return purchase
+
+
+def _release(sessions, holds):
+    holds_by_session = {}
+    for hold in holds:
+        holds_by_session.setdefault(hold.session_id, []).append(hold)
+
+    for session in sessions:
+        seat_map = session.get_seat_map()
+        for hold in holds_by_session.get(session.pk, []):
+            seat_map.release(_seats_from_json(hold.seats))
+        _patch_schedule(session, seat_map.free_count() - session.rest_of_seats)
+        session.seat_map = seat_map.to_bytes()
+        session.rest_of_seats = seat_map.free_count()
+        session.seats_version += 1
+
+    Session.objects.bulk_update(sessions, ['seat_map', 'rest_of_seats', 'seats_version'])
+    SeatHold.objects.filter(pk__in=[hold.pk for hold in holds]).delete()
+
+
+def release_hold(hold):
+    with transaction.atomic():
+        sessions = _lock_sessions([hold.session_id])
+        _release(sessions, list(SeatHold.objects.filter(pk=hold.pk).only('id', 'session_id', 'seats')))
+
+
+def sweep_expired_holds(now=None, batch_size=500):
+    now = now or timezone.now()
+    released = 0
+
+    while True:
+        session_ids = list(
+            SeatHold.objects.filter(expires_at__lte=now)
+            .values_list('session_id', flat=True).distinct()[:batch_size]
+        )
+        if not session_ids:
+            return released
+
+        with transaction.atomic():
+            sessions = _lock_sessions(session_ids)
+            holds = list(
+                SeatHold.objects.filter(session_id__in=session_ids, expires_at__lte=now)
+                .only('id', 'session_id', 'seats')
+            )
+            _release(sessions, holds)
+        released += len(holds)
@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.db import transaction
+
+from cinema_app import analytics, schedule, versions
+from cinema_app.models import Session
+
+BATCH_SIZE = 500
+WEEKDAYS = (
+    (0, 'Monday'),
+    (1, 'Tuesday'),
+    (2, 'Wednesday'),
+    (3, 'Thursday'),
+    (4, 'Friday'),
+    (5, 'Saturday'),
+    (6, 'Sunday'),
+)
+
+
+class ScheduleRule:
+    def __init__(self, film, hall, price, showtimes, date_start=None, date_finish=None,
+                 weekdays=None, excluded_dates=None):
+        self.film = film
+        self.hall = hall
+        self.price = price
+        self.showtimes = sorted(set(showtimes))
+        self.date_start = date_start or film.date_start
+        self.date_finish = date_finish or film.date_finish
+        self.weekdays = set(weekdays) if weekdays else None
+        self.excluded_dates = set(excluded_dates or ())
+
+    def dates(self):
+        day = self.date_start
+        while day <= self.date_finish:
+            if self.weekdays is None or day.weekday() in self.weekdays:
+                if day not in self.excluded_dates:
+                    yield day
+            day += timedelta(days=1)
+
+    def sessions(self):
+        for day in self.dates():
+            for time_start, time_end in self.showtimes:
+                yield Session(
+                    date=day,
+                    time_start=time_start,
+                    time_end=time_end,
+                    price=self.price,
+                    rest_of_seats=self.hall.size,
+                    hall=self.hall,
+                    film=self.film
+                )
+
+
+def create_sessions(rule, batch_size=BATCH_SIZE):
+    sessions = list(rule.sessions())
+
+    with transaction.atomic():
+        Session.objects.bulk_create(sessions, batch_size=batch_size)
+        transaction.on_commit(schedule.invalidate_all)
+        transaction.on_commit(lambda: versions.bump('session'))
+        transaction.on_commit(lambda: analytics.refresh_capacity(
+            {(session.hall_id, session.date) for session in sessions}
+        ))
+
+    dates = sorted({session.date for session in sessions})
+    return {
+        'created': len(sessions),
+        'days': len(dates),
+        'showtimes_per_day': len(rule.showtimes),
+        'date_start': dates[0] if dates else None,
+        'date_finish': dates[-1] if dates else None,
+        'excluded_dates': sorted(day for day in rule.excluded_dates
+                                 if rule.date_start <= day <= rule.date_finish),
+    }
@@ -0,0 +1,56 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from random import choice
+
+from django.conf import settings
+from django.contrib.sessions.base_session import AbstractBaseSession
+from django.db import connections
+
+REPLICA_DATABASES = getattr(settings, 'REPLICA_DATABASES', [])
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_wrote = ContextVar('wrote', default=False)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    reads_token = _replica_reads.set(enabled)
+    wrote_token = _wrote.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(reads_token)
+        _wrote.reset(wrote_token)
+
+
+def wrote():
+    return _wrote.get()
+
+
+def same_database(alias, other):
+    first, second = connections[alias].settings_dict, connections[other].settings_dict
+    return all(first.get(key) == second.get(key) for key in ('ENGINE', 'NAME', 'HOST', 'PORT'))
+
+
+def replicas():
+    return [alias for alias in REPLICA_DATABASES if not same_database(alias, 'default')]
+
+
+def is_session(model):
+    return issubclass(model, AbstractBaseSession)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or _wrote.get() or is_session(model):
+            return 'default'
+        aliases = replicas()
+        return choice(aliases) if aliases else 'default'
+
+    def db_for_write(self, model, **hints):
+        if not is_session(model):
+            _wrote.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
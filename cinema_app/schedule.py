@@ -0,0 +1,144 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from cinema_app.models import Session
+from cinema_app.showtimes import day_films
+
+SORT_OPTIONS = ('default', 'price', 'time')
+SNAPSHOT_TIMEOUT = getattr(settings, 'SCHEDULE_SNAPSHOT_TIMEOUT', 300)
+GENERATION_KEY = 'schedule:generation'
+
+
+def _snapshot_key(selected_date, sort_by, generation=None):
+    if generation is None:
+        generation = cache.get_or_set(GENERATION_KEY, 0, None)
+    return f'schedule:{generation}:{selected_date.isoformat()}:{sort_by}'
+
+
+def _seats_key(session_id):
+    return f'schedule:seats:{session_id}'
+
+
+def _seat_counts(snapshot):
+    return [(session['id'], session['rest_of_seats']) for film in snapshot for session in film['sessions']]
+
+
+def _seat_keys(snapshot):
+    return {_seats_key(session_id): session_id for session_id, _ in _seat_counts(snapshot)}
+
+
+def _remember_seats(snapshot):
+    for session_id, rest_of_seats in _seat_counts(snapshot):
+        cache.add(_seats_key(session_id), rest_of_seats, SNAPSHOT_TIMEOUT)
+
+
+def _apply_seats(snapshot, seats):
+    for film in snapshot:
+        for session in film['sessions']:
+            session['rest_of_seats'] = seats.get(session['id'], session['rest_of_seats'])
+    return snapshot
+
+
+def _with_seats(snapshot):
+    keys = _seat_keys(snapshot)
+    seats = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    missing = [session_id for session_id in keys.values() if session_id not in seats]
+    if missing:
+        for session_id, rest_of_seats in Session.objects.filter(pk__in=missing).values_list('id', 'rest_of_seats'):
+            cache.add(_seats_key(session_id), rest_of_seats, SNAPSHOT_TIMEOUT)
+            seats[session_id] = rest_of_seats
+    return _apply_seats(snapshot, seats)
+
+
+async def _awith_seats(snapshot):
+    keys = _seat_keys(snapshot)
+    seats = {keys[key]: value for key, value in (await cache.aget_many(keys)).items()}
+    missing = [session_id for session_id in keys.values() if session_id not in seats]
+    if missing:
+        async for session_id, rest_of_seats in Session.objects.filter(pk__in=missing).values_list('id', 'rest_of_seats'):
+            await cache.aadd(_seats_key(session_id), rest_of_seats, SNAPSHOT_TIMEOUT)
+            seats[session_id] = rest_of_seats
+    return _apply_seats(snapshot, seats)
+
+
+def _serialize_session(session):
+    hall = session.hall
+    return {
+        'id': session.id,
+        'date': session.date,
+        'time_start': session.time_start,
+        'time_end': session.time_end,
+        'price': session.price,
+        'rest_of_seats': session.rest_of_seats,
+        'hall': {
+            'id': hall.id,
+            'name': hall.name,
+            'size': hall.size,
+            'has_sessions': session.hall_has_sessions,
+        },
+    }
+
+
+def _serialize_film(film):
+    return {
+        'id': film.id,
+        'name': film.name,
+        'description': film.description,
+        'sessions': [_serialize_session(session) for session in film.day_sessions],
+    }
+
+
+def build_schedule_snapshot(selected_date, sort_by='default'):
+    return [_serialize_film(film) for film in day_films(selected_date, sort_by)]
+
+
+async def abuild_schedule_snapshot(selected_date, sort_by='default'):
+    return [_serialize_film(film) async for film in day_films(selected_date, sort_by)]
+
+
+def get_schedule_snapshot(selected_date, sort_by='default'):
+    if sort_by not in SORT_OPTIONS:
+        sort_by = 'default'
+
+    key = _snapshot_key(selected_date, sort_by)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_schedule_snapshot(selected_date, sort_by)
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+        _remember_seats(snapshot)
+    return _with_seats(snapshot)
+
+
+async def aget_schedule_snapshot(selected_date, sort_by='default'):
+    if sort_by not in SORT_OPTIONS:
+        sort_by = 'default'
+
+    generation = await cache.aget_or_set(GENERATION_KEY, 0, None)
+    key = _snapshot_key(selected_date, sort_by, generation)
+    snapshot = await cache.aget(key)
+    if snapshot is None:
+        snapshot = await abuild_schedule_snapshot(selected_date, sort_by)
+        await cache.aset(key, snapshot, SNAPSHOT_TIMEOUT)
+        for session_id, rest_of_seats in _seat_counts(snapshot):
+            await cache.aadd(_seats_key(session_id), rest_of_seats, SNAPSHOT_TIMEOUT)
+    return await _awith_seats(snapshot)
+
+
+def invalidate_session(session_id, selected_date):
+    cache.delete(_seats_key(session_id))
+    if selected_date is not None:
+        cache.delete_many([_snapshot_key(selected_date, sort_by) for sort_by in SORT_OPTIONS])
+
+
+def invalidate_all():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def patch_session_seats(session_id, delta):
+    try:
+        cache.incr(_seats_key(session_id), delta)
+    except ValueError:
+        pass
@@ -0,0 +1,100 @@
+class SeatMap:
+    def __init__(self, rows, seats_per_row, data=b''):
+        self.rows = rows
+        self.seats_per_row = seats_per_row
+        self.bits = int.from_bytes(bytes(data or b''), 'little')
+
+    @property
+    def size(self):
+        return self.rows * self.seats_per_row
+
+    def index(self, row, seat):
+        if not (1 <= row <= self.rows and 1 <= seat <= self.seats_per_row):
+            raise ValueError(f'Seat {row}-{seat} does not exist in this hall.')
+        return (row - 1) * self.seats_per_row + seat - 1
+
+    def is_taken(self, row, seat):
+        return bool(self.bits >> self.index(row, seat) & 1)
+
+    def is_free(self, seats):
+        return all(not self.is_taken(row, seat) for row, seat in seats)
+
+    def take(self, seats):
+        for row, seat in seats:
+            self.bits |= 1 << self.index(row, seat)
+
+    def release(self, seats):
+        for row, seat in seats:
+            self.bits &= ~(1 << self.index(row, seat))
+
+    def taken_count(self):
+        return bin(self.bits & ((1 << self.size) - 1)).count('1')
+
+    def free_count(self):
+        return self.size - self.taken_count()
+
+    def row_bits(self, row):
+        return self.bits >> (row - 1) * self.seats_per_row & ((1 << self.seats_per_row) - 1)
+
+    def available(self):
+        return [
+            (row, seat)
+            for row in range(1, self.rows + 1)
+            for seat in range(1, self.seats_per_row + 1)
+            if not self.row_bits(row) >> seat - 1 & 1
+        ]
+
+    def _distance(self, row, seat, count):
+        middle_row = (self.rows + 1) / 2
+        middle_seat = (self.seats_per_row + 1) / 2
+        return abs(row - middle_row) * self.seats_per_row + abs(seat + (count - 1) / 2 - middle_seat)
+
+    def best_block(self, count):
+        if count <= 0 or count > self.seats_per_row:
+            return None
+
+        block_mask = (1 << count) - 1
+        best = None
+        for row in range(1, self.rows + 1):
+            row_bits = self.row_bits(row)
+            for seat in range(1, self.seats_per_row - count + 2):
+                if row_bits >> seat - 1 & block_mask:
+                    continue
+                distance = self._distance(row, seat, count)
+                if best is None or distance < best[0]:
+                    best = (distance, row, seat)
+
+        if best is None:
+            return None
+        _, row, seat = best
+        return [(row, seat + offset) for offset in range(count)]
+
+    def pick(self, count):
+        block = self.best_block(count)
+        if block is not None:
+            return block
+
+        available = sorted(self.available(), key=lambda seat: self._distance(*seat, 1))
+        if len(available) < count:
+            return None
+        return sorted(available[:count])
+
+    def render(self):
+        return [
+            ''.join('X' if row_bits >> seat & 1 else '.' for seat in range(self.seats_per_row))
+            for row_bits in (self.row_bits(row) for row in range(1, self.rows + 1))
+        ]
+
+    def availability(self, amount=None):
+        data = {
+            'rows': self.rows,
+            'seats_per_row': self.seats_per_row,
+            'rest_of_seats': self.free_count(),
+            'map': self.render(),
+        }
+        if amount:
+            data['best_seats'] = [{'row': row, 'seat': seat} for row, seat in self.pick(amount) or []]
+        return data
+
+    def to_bytes(self):
+        return (self.bits & ((1 << self.size) - 1)).to_bytes((self.size + 7) // 8, 'little')
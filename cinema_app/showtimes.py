@@ -0,0 +1,30 @@
+from django.db.models import Exists, OuterRef, Prefetch, Subquery
+
+from cinema_app.models import Film, Session
+
+
+def day_sessions(selected_date, sort_by='default'):
+    sessions = Session.objects.filter(date=selected_date).select_related('hall').annotate(
+        hall_has_sessions=Exists(Session.objects.filter(hall=OuterRef('hall_id')))
+    )
+
+    if sort_by == 'price':
+        return sessions.order_by('-price', 'time_start', 'id')
+    elif sort_by == 'time':
+        return sessions.order_by('time_start', 'id')
+    return sessions.order_by('id')
+
+
+def day_films(selected_date, sort_by='default'):
+    films_sessions = Session.objects.filter(film=OuterRef('pk'), date=selected_date)
+    films = Film.objects.filter(Exists(films_sessions)).prefetch_related(
+        Prefetch('session', queryset=day_sessions(selected_date, sort_by), to_attr='day_sessions')
+    )
+
+    if sort_by == 'price':
+        top_price = films_sessions.order_by('-price').values('price')[:1]
+        return films.annotate(top_price=Subquery(top_price)).order_by('-top_price', 'id')
+    elif sort_by == 'time':
+        first_time = films_sessions.order_by('time_start').values('time_start')[:1]
+        return films.annotate(first_time=Subquery(first_time)).order_by('first_time', 'id')
+    return films.order_by('id')
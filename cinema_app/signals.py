@@ -0,0 +1,42 @@
+from django.db import transaction, connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_init, post_save, post_delete, post_migrate
+from django.dispatch import receiver
+
+from cinema_app import analytics, schedule, versions
+from cinema_app.conflicts import install_sqlite_overlap_triggers
+from cinema_app.models import Session, Film, Hall
+from cinema_app.pooling import metrics as pool_metrics
+
+
+@receiver(post_init, sender=Session)
+def remember_hall_day(sender, instance, **kwargs):
+    instance._loaded_hall_day = instance.__dict__.get('hall_id'), instance.__dict__.get('date')
+
+
+@receiver([post_save, post_delete], sender=Session)
+def session_changed(sender, instance, **kwargs):
+    session_id, session_date = instance.pk, instance.date
+    hall_days = {instance._loaded_hall_day, (instance.hall_id, instance.date)}
+    instance._loaded_hall_day = instance.hall_id, instance.date
+    transaction.on_commit(lambda: schedule.invalidate_session(session_id, session_date))
+    transaction.on_commit(lambda: versions.bump('session'))
+    transaction.on_commit(lambda: analytics.refresh_capacity(hall_days))
+
+
+@receiver([post_save, post_delete], sender=Film)
+@receiver([post_save, post_delete], sender=Hall)
+def catalogue_changed(sender, instance, **kwargs):
+    transaction.on_commit(schedule.invalidate_all)
+    transaction.on_commit(lambda: versions.bump(sender.__name__.lower()))
+
+
+@receiver(connection_created)
+def count_new_connection(sender, connection, **kwargs):
+    pool_metrics.add('new_connections')
+
+
+@receiver(post_migrate)
+def install_overlap_triggers(sender, using, **kwargs):
+    if sender.name == 'cinema_app':
+        install_sqlite_overlap_triggers(connections[using])
@@ -1,3 +1,1585 @@
-from django.test import TestCase
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time, timedelta
+from importlib import import_module
+from io import StringIO
+from tempfile import NamedTemporaryFile
+from threading import BoundedSemaphore
+from time import perf_counter, sleep, time as time_now
+from unittest import skipUnless
+from unittest.mock import Mock, patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.contrib.sessions.models import Session as DjangoSession
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import connection, connections, transaction, IntegrityError, OperationalError
+from django.db.models import F, Sum
+from django.urls import resolve, reverse
+from django.test import TestCase, TransactionTestCase, SimpleTestCase, Client, AsyncClient, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+
+import cinema_app.API.urls
+import django_cinema.urls
+from cinema_app import checks, middlewares, pooling, purchases
+
+from cinema_app.API.fast import FastSerializer
+from cinema_app.API.resources import SessionModelViewSet
+from cinema_app.API.serializers import SessionSerializer, FilmSerializer, HallSerializer
+from cinema_app.analytics import roll_up_sales, rebuild_sales_stats
+from cinema_app.feed import SeatFeed, parse_watch
+from cinema_app.exports import export_sales, sale_records, sales
+from cinema_app.importer import import_schedule
+from cinema_app.routers import ReplicaRouter, replica_reads
+from cinema_app.conflicts import conflicting_sessions, find_conflicts
+from cinema_app.ledger import roll_up_spend, pending_spent, reconcile_spend
+from cinema_app.models import Hall, Film, Session, Purchase, User, SeatHold, SpendEntry, SessionStats, FilmDayStats, \
+    HallDayStats
+from cinema_app.purchases import buy_tickets, buy_group, hold_seats, confirm_hold, release_hold, sweep_expired_holds, \
+    SoldOut, HoldExpired
+from cinema_app.recurrence import ScheduleRule, create_sessions
+from cinema_app.schedule import get_schedule_snapshot, patch_session_seats
+from cinema_app.seatmap import SeatMap
+from cinema_app.showtimes import day_films
+
+
+def create_schedule(films_count, sessions_per_film=3, day=None):
+    day = day or date.today()
+    for i in range(films_count):
+        hall = Hall.objects.create(name=f'Hall {i}', size=100)
+        film = Film.objects.create(
+            name=f'Film {i}', description='Description',
+            date_start=day - timedelta(days=1), date_finish=day + timedelta(days=1)
+        )
+        for j in range(sessions_per_film):
+            for session_date in (day - timedelta(days=1), day, day + timedelta(days=1)):
+                Session.objects.create(
+                    date=session_date, time_start=time(10 + j), time_end=time(11 + j),
+                    price=10 * (i + j + 1), rest_of_seats=100, hall=hall, film=film
+                )
+
+
+class ShowtimeQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def count_homepage_queries(self, **params):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/', params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_day_films_uses_constant_queries(self):
+        create_schedule(films_count=15)
+
+        with self.assertNumQueries(2):
+            for film in day_films(date.today()):
+                for session in film.day_sessions:
+                    session.hall.name, session.hall_has_sessions
+
+    def test_day_films_only_loads_selected_day(self):
+        create_schedule(films_count=2)
+
+        for film in day_films(date.today()):
+            self.assertEqual({session.date for session in film.day_sessions}, {date.today()})
+            self.assertEqual(len(film.day_sessions), 3)
+
+    def test_sorting_does_not_duplicate_films(self):
+        create_schedule(films_count=4)
+
+        for sort_by in ('default', 'price', 'time'):
+            films = list(day_films(date.today(), sort_by))
+            self.assertEqual(len(films), 4)
+            self.assertEqual(len({film.id for film in films}), 4)
+
+        prices = [film.top_price for film in day_films(date.today(), 'price')]
+        self.assertEqual(prices, sorted(prices, reverse=True))
+
+    def test_homepage_query_count_does_not_grow_with_catalogue(self):
+        create_schedule(films_count=1)
+        small = self.count_homepage_queries()
+
+        create_schedule(films_count=20)
+        large = self.count_homepage_queries()
+        large_sorted = self.count_homepage_queries(sort_by='price', day='tomorrow')
+
+        self.assertEqual(small, large)
+        self.assertEqual(small, large_sorted)
+
+
+class ScheduleSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_schedule(films_count=2, sessions_per_film=1)
+        self.session = Session.objects.filter(date=date.today()).select_related('hall', 'film').order_by('id').first()
+        self.user = User.objects.create(username='buyer')
+
+    def snapshot_sessions(self):
+        return {session['id']: session for film in get_schedule_snapshot(date.today()) for session in film['sessions']}
+
+    def test_session_changes_invalidate_the_day(self):
+        get_schedule_snapshot(date.today())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            added = Session.objects.create(
+                date=date.today(), time_start=time(20), time_end=time(21),
+                price=10, rest_of_seats=100, hall=self.session.hall, film=self.session.film
+            )
+        self.assertIn(added.pk, self.snapshot_sessions())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            added.delete()
+        self.assertNotIn(added.pk, self.snapshot_sessions())
+
+    def test_film_and_hall_changes_invalidate_every_day(self):
+        get_schedule_snapshot(date.today())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            film = self.session.film
+            film.name = 'Renamed film'
+            film.save()
+            hall = self.session.hall
+            hall.name = 'Renamed hall'
+            hall.save()
+
+        snapshot = get_schedule_snapshot(date.today())
+        self.assertIn('Renamed film', [film['name'] for film in snapshot])
+        self.assertEqual(self.snapshot_sessions()[self.session.pk]['hall']['name'], 'Renamed hall')
+
+    def test_purchases_patch_seat_counts_without_queries(self):
+        get_schedule_snapshot(date.today())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            buy_tickets(self.session, self.user, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            hold = hold_seats(self.session, self.user, 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.snapshot_sessions()[self.session.pk]['rest_of_seats'], 95)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            release_hold(hold)
+        self.assertEqual(self.snapshot_sessions()[self.session.pk]['rest_of_seats'], 98)
+
+    def test_concurrent_patches_are_not_lost(self):
+        get_schedule_snapshot(date.today())
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: patch_session_seats(self.session.pk, -1), range(40)))
+
+        self.assertEqual(self.snapshot_sessions()[self.session.pk]['rest_of_seats'], 60)
+
+    def test_missing_seat_counts_are_read_from_the_database(self):
+        get_schedule_snapshot(date.today())
+        Session.objects.filter(pk=self.session.pk).update(rest_of_seats=42)
+        cache.delete(f'schedule:seats:{self.session.pk}')
+
+        self.assertEqual(self.snapshot_sessions()[self.session.pk]['rest_of_seats'], 42)
+
+
+class RecurrenceTests(TestCase):
+    def setUp(self):
+        self.hall = Hall.objects.create(name='Hall', rows=4, seats_per_row=5)
+        self.film = Film.objects.create(
+            name='Film', description='Description',
+            date_start=date(2024, 1, 1), date_finish=date(2024, 1, 14)
+        )
+        self.showtimes = [(time(18), time(20)), (time(12), time(14))]
+
+    def test_weekdays_and_excluded_dates_are_skipped(self):
+        rule = ScheduleRule(self.film, self.hall, 10, self.showtimes, weekdays=[0, 2],
+                            excluded_dates=[date(2024, 1, 3), date(2024, 2, 1)])
+
+        self.assertEqual(list(rule.dates()), [date(2024, 1, 1), date(2024, 1, 8), date(2024, 1, 10)])
+
+    def test_every_showtime_is_created_on_every_day(self):
+        rule = ScheduleRule(self.film, self.hall, 10, self.showtimes + [(time(12), time(14))],
+                            date_start=date(2024, 1, 5), date_finish=date(2024, 1, 6))
+        create_sessions(rule)
+
+        self.assertEqual(
+            list(Session.objects.order_by('date', 'time_start').values_list('date', 'time_start', 'rest_of_seats')),
+            [(date(2024, 1, 5), time(12), 20), (date(2024, 1, 5), time(18), 20),
+             (date(2024, 1, 6), time(12), 20), (date(2024, 1, 6), time(18), 20)]
+        )
+
+    def test_summary_describes_the_created_schedule(self):
+        rule = ScheduleRule(self.film, self.hall, 10, self.showtimes, weekdays=[0, 2],
+                            excluded_dates=[date(2024, 1, 3), date(2024, 2, 1)])
+
+        self.assertEqual(create_sessions(rule), {
+            'created': 6,
+            'days': 3,
+            'showtimes_per_day': 2,
+            'date_start': date(2024, 1, 1),
+            'date_finish': date(2024, 1, 10),
+            'excluded_dates': [date(2024, 1, 3)],
+        })
+
+    def test_empty_rule_creates_nothing(self):
+        rule = ScheduleRule(self.film, self.hall, 10, self.showtimes, excluded_dates=[date(2024, 1, 1)],
+                            date_start=date(2024, 1, 1), date_finish=date(2024, 1, 1))
+
+        summary = create_sessions(rule)
+        self.assertEqual((summary['created'], summary['date_start']), (0, None))
+
+    def test_conflict_rolls_back_every_batch(self):
+        Session.objects.create(
+            date=date(2024, 1, 12), time_start=time(19), time_end=time(21),
+            price=10, rest_of_seats=20, hall=self.hall, film=self.film
+        )
+
+        with self.assertRaises(IntegrityError):
+            create_sessions(ScheduleRule(self.film, self.hall, 10, self.showtimes), batch_size=2)
+
+        self.assertEqual(Session.objects.count(), 1)
+
+
+class HallConflictTests(TestCase):
+    def setUp(self):
+        self.hall = Hall.objects.create(name='Hall', size=50)
+        self.film = Film.objects.create(
+            name='Film', description='Description',
+            date_start=date(2024, 1, 1), date_finish=date(2024, 1, 31)
+        )
+        Session.objects.create(
+            date=date(2024, 1, 10), time_start=time(18), time_end=time(20),
+            price=10, rest_of_seats=50, hall=self.hall, film=self.film
+        )
+
+    def test_same_time_on_another_date_does_not_conflict(self):
+        self.assertFalse(conflicting_sessions(self.hall, date(2024, 1, 11), time(18), time(20)).exists())
+        self.assertTrue(conflicting_sessions(self.hall, date(2024, 1, 10), time(19), time(21)).exists())
+
+    def test_schedule_is_checked_in_one_query(self):
+        rule = ScheduleRule(self.film, self.hall, 10, [(time(12), time(14)), (time(19), time(21))])
+
+        with self.assertNumQueries(1):
+            conflicts = find_conflicts(rule.sessions())
+
+        self.assertEqual([(session.date, session.time_start) for session in conflicts],
+                         [(date(2024, 1, 10), time(19))])
+
+    def test_overlapping_showtimes_in_one_schedule_conflict(self):
+        rule = ScheduleRule(self.film, self.hall, 10, [(time(9), time(11)), (time(10), time(12))],
+                            date_start=date(2024, 1, 1), date_finish=date(2024, 1, 1))
+
+        self.assertEqual(len(find_conflicts(rule.sessions())), 1)
+
+    def test_database_rejects_overlapping_session(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Session.objects.create(
+                date=date(2024, 1, 10), time_start=time(19), time_end=time(21),
+                price=10, rest_of_seats=50, hall=self.hall, film=self.film
+            )
+
+    def test_overlapping_edits_are_rejected_not_500(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@cinema.test', 'password'))
+        session = Session.objects.create(
+            date=date(2024, 1, 10), time_start=time(21), time_end=time(23),
+            price=10, rest_of_seats=50, hall=self.hall, film=self.film
+        )
+        data = {'time_start': '19:00', 'time_end': '22:00', 'price': 10, 'hall': self.hall.pk, 'film': self.film.pk}
+        url = reverse('update_session', kwargs={'pk': session.pk})
+
+        self.assertEqual(self.client.post(url, data).status_code, 200)
+        with patch('cinema_app.forms.conflicting_sessions', return_value=Session.objects.none()):
+            self.assertEqual(self.client.post(url, data).status_code, 200)
+        with patch('cinema_app.API.serializers.conflicting_sessions', return_value=Session.objects.none()):
+            response = self.client.put(reverse('session-detail', kwargs={'pk': session.pk}),
+                                       {**data, 'date': '2024-01-10'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        session.refresh_from_db()
+        self.assertEqual((session.time_start, session.time_end), (time(21), time(23)))
+
+    @skipUnless(connection.vendor == 'postgresql', 'The exclusion constraint is PostgreSQL only.')
+    def test_migration_drops_duplicates_and_reports_overlaps(self):
+        migration = import_module('cinema_app.migrations.0002_session_hall_conflicts')
+        with connection.schema_editor() as schema_editor:
+            schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            schema_editor.execute(migration.POSTGRES_CONSTRAINT_REVERSE)
+
+        duplicates = [
+            Session.objects.create(
+                date=date(2024, 1, 10), time_start=time(18), time_end=time(20),
+                price=10, rest_of_seats=50, hall=self.hall, film=self.film
+            )
+            for _ in range(2)
+        ]
+        Purchase.objects.create(amount=1, price=10, ticket=duplicates[1], buyer=User.objects.create(username='buyer'))
+
+        migration.resolve_overlapping_sessions(django_apps, None)
+        self.assertEqual(list(Session.objects.order_by('id')), [duplicates[1]])
+
+        overlap = Session.objects.create(
+            date=date(2024, 1, 10), time_start=time(19), time_end=time(21),
+            price=10, rest_of_seats=50, hall=self.hall, film=self.film
+        )
+        with self.assertRaisesMessage(ValueError, f'session {overlap.pk}: hall {self.hall.pk}, 2024-01-10 19:00:00-21:00:00'):
+            migration.resolve_overlapping_sessions(django_apps, None)
+
+
+class AtomicPurchaseTests(TransactionTestCase):
+    buyers = 24
+    seats = 10
+
+    def setUp(self):
+        hall = Hall.objects.create(name='Premiere', size=self.seats)
+        film = Film.objects.create(name='Film', description='Description',
+                                   date_start=date.today(), date_finish=date.today())
+        self.session = Session.objects.create(
+            date=date.today(), time_start=time(20), time_end=time(22),
+            price=15, rest_of_seats=self.seats, hall=hall, film=film
+        )
+        self.users = [User.objects.create(username=f'buyer{i}') for i in range(self.buyers)]
+
+    def buy(self, user):
+        try:
+            for _ in range(100):
+                try:
+                    buy_tickets(Session.objects.get(pk=self.session.pk), user, 1)
+                    return True
+                except SoldOut:
+                    return False
+                except OperationalError:
+                    # SQLite's shared in-memory test database locks whole tables.
+                    sleep(0.01)
+            return False
+        finally:
+            connection.close()
+
+    def test_sold_out_result(self):
+        buy_tickets(self.session, self.users[0], self.seats)
+
+        with self.assertRaises(SoldOut):
+            buy_tickets(self.session, self.users[1], 1)
+        self.users[0].refresh_from_db()
+        self.assertEqual(self.users[0].total_spent, 15 * self.seats)
+
+    def test_parallel_buyers_never_oversell_or_lose_updates(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(self.buy, self.users))
+
+        self.session.refresh_from_db()
+        self.assertEqual(results.count(True), self.seats)
+        self.assertEqual(self.session.rest_of_seats, 0)
+        self.assertEqual(self.session.seats_version, self.seats)
+        self.assertEqual(self.session.get_seat_map().taken_count(), self.seats)
+
+        sold = [(seat['row'], seat['seat']) for seats in Purchase.objects.values_list('seats', flat=True) for seat in seats]
+        self.assertEqual(len(sold), self.seats)
+        self.assertEqual(len(set(sold)), self.seats)
+        self.assertEqual(
+            set(Purchase.objects.values_list('buyer_id', flat=True)),
+            {user.pk for user, bought in zip(self.users, results) if bought}
+        )
+        roll_up_spend()
+        self.assertEqual(User.objects.aggregate(spent=Sum('total_spent'))['spent'], 15 * self.seats)
+
+
+class SeatMapTests(SimpleTestCase):
+    def test_take_and_count(self):
+        seat_map = SeatMap(rows=3, seats_per_row=4)
+        seat_map.take([(1, 1), (2, 2), (2, 3)])
+
+        restored = SeatMap(3, 4, seat_map.to_bytes())
+        self.assertEqual(len(seat_map.to_bytes()), 2)
+        self.assertEqual(restored.free_count(), 9)
+        self.assertTrue(restored.is_taken(2, 3))
+        self.assertEqual(restored.render(), ['X...', '.XX.', '....'])
+
+    def test_best_block_prefers_centre_and_skips_taken_seats(self):
+        seat_map = SeatMap(rows=3, seats_per_row=6)
+        self.assertEqual(seat_map.best_block(2), [(2, 3), (2, 4)])
+
+        seat_map.take([(2, 3)])
+        self.assertNotIn((2, 3), seat_map.best_block(2))
+        self.assertIsNone(seat_map.best_block(7))
+        self.assertEqual(len(seat_map.pick(7)), 7)
+
+
+class SeatHoldTests(TestCase):
+    def setUp(self):
+        hall = Hall.objects.create(name='Hall', rows=2, seats_per_row=5)
+        film = Film.objects.create(name='Film', description='Description',
+                                   date_start=date.today(), date_finish=date.today())
+        self.sessions = [
+            Session.objects.create(
+                date=date.today(), time_start=time(10 + 2 * i), time_end=time(11 + 2 * i),
+                price=10, rest_of_seats=10, hall=hall, film=film
+            )
+            for i in range(3)
+        ]
+        self.user = User.objects.create(username='buyer')
+
+    def test_held_seats_count_against_availability_until_confirmed(self):
+        hold = hold_seats(self.sessions[0], self.user, 2)
+        self.sessions[0].refresh_from_db()
+        self.assertEqual(self.sessions[0].rest_of_seats, 8)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            purchase = confirm_hold(hold)
+        self.user.refresh_from_db()
+        self.assertEqual(purchase.seats, hold.seats)
+        self.assertEqual(self.user.total_spent, 20)
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_reserve_retries_when_another_buyer_wins_the_version(self):
+        session, other = self.sessions[0], User.objects.create(username='other')
+        take_seats, attempts = purchases._take, []
+
+        def take(seat_map, amount, seats=None):
+            attempts.append(seats)
+            if len(attempts) == 1:
+                buy_tickets(Session.objects.get(pk=session.pk), other, 1, [(1, 3)])
+            return take_seats(seat_map, amount, seats)
+
+        with patch('cinema_app.purchases._take', take), CaptureQueriesContext(connection) as queries:
+            buy_tickets(session, self.user, 2)
+
+        self.assertEqual(len(attempts), 3)
+        self.assertFalse(any('FOR UPDATE' in query['sql'] for query in queries))
+        session.refresh_from_db()
+        self.assertEqual((session.rest_of_seats, session.seats_version), (7, 2))
+        self.assertEqual(session.get_seat_map().taken_count(), 3)
+
+    def test_expired_hold_cannot_be_confirmed(self):
+        hold = hold_seats(self.sessions[0], self.user, 2, ttl=-1)
+
+        with self.assertRaises(HoldExpired):
+            confirm_hold(hold)
+
+    def test_sweeper_releases_expired_holds_in_batches(self):
+        for session in self.sessions:
+            for _ in range(3):
+                hold_seats(session, self.user, 2, ttl=-1)
+        live = hold_seats(self.sessions[0], self.user, 1)
+
+        self.assertEqual(sweep_expired_holds(batch_size=2), 9)
+        self.assertEqual(list(SeatHold.objects.all()), [live])
+        self.assertEqual(
+            list(Session.objects.order_by('pk').values_list('rest_of_seats', flat=True)), [9, 10, 10]
+        )
+
+
+class HallLayoutTests(TestCase):
+    def setUp(self):
+        self.hall = Hall.objects.create(name='Hall', rows=2, seats_per_row=5)
+        self.empty = Hall.objects.create(name='Empty', rows=2, seats_per_row=5)
+        film = Film.objects.create(name='Film', description='Description',
+                                   date_start=date.today(), date_finish=date.today())
+        Session.objects.create(date=date.today(), time_start=time(10), time_end=time(12),
+                               price=10, rest_of_seats=10, hall=self.hall, film=film)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@cinema.test', 'password'))
+
+    def test_layout_is_locked_once_the_hall_has_sessions(self):
+        url = reverse('update_hall', kwargs={'pk': self.hall.pk})
+        self.client.post(url, {'name': 'Hall', 'rows': 3, 'seats_per_row': 5})
+        response = self.client.patch(reverse('hall-detail', kwargs={'pk': self.hall.pk}), {'seats_per_row': 4},
+                                     content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.hall.refresh_from_db()
+        self.assertEqual((self.hall.rows, self.hall.seats_per_row, self.hall.size), (2, 5, 10))
+
+    def test_name_and_empty_halls_can_still_change(self):
+        self.client.post(reverse('update_hall', kwargs={'pk': self.hall.pk}), {'name': 'Red', 'rows': 2, 'seats_per_row': 5})
+        response = self.client.patch(reverse('hall-detail', kwargs={'pk': self.empty.pk}), {'rows': 4},
+                                     content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Hall.objects.get(pk=self.hall.pk).name, 'Red')
+        self.assertEqual(Hall.objects.get(pk=self.empty.pk).size, 20)
+
+    def test_api_still_accepts_a_plain_size(self):
+        response = self.client.post(reverse('hall-list'), {'name': 'Old', 'size': 30}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['rows'], response.json()['seats_per_row'], response.json()['size']), (1, 30, 30))
+        self.assertEqual(self.client.post(reverse('hall-list'), {'name': 'Bare'}).status_code, 400)
+
+
+class SpendLedgerTests(TestCase):
+    def setUp(self):
+        hall = Hall.objects.create(name='Hall', size=20)
+        film = Film.objects.create(name='Film', description='Description',
+                                   date_start=date.today(), date_finish=date.today())
+        self.session = Session.objects.create(
+            date=date.today(), time_start=time(10), time_end=time(12),
+            price=12, rest_of_seats=20, hall=hall, film=film
+        )
+        self.user = User.objects.create(username='buyer')
+
+    def test_pending_entries_are_rolled_up(self):
+        buy_tickets(self.session, self.user, 2)
+        buy_tickets(self.session, self.user, 1)
+
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.total_spent, pending_spent(self.user)), (0, 36))
+
+        self.assertEqual(roll_up_spend(), 2)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.total_spent, pending_spent(self.user)), (36, 0))
+
+    def test_reconcile_recomputes_totals_from_purchases(self):
+        buy_tickets(self.session, self.user, 3)
+        roll_up_spend()
+        User.objects.filter(pk=self.user.pk).update(total_spent=999)
+        buy_tickets(self.session, self.user, 1)
+
+        self.assertEqual(len(reconcile_spend()), 1)
+        roll_up_spend()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.total_spent, 48)
+
+    def test_reconcile_keeps_the_price_paid(self):
+        buy_tickets(self.session, self.user, 2)
+        roll_up_spend()
+        Session.objects.filter(pk=self.session.pk).update(price=50)
+
+        self.assertEqual(reconcile_spend(batch_size=1), [])
+        self.assertEqual(Purchase.objects.get(buyer=self.user).price, 12)
+        self.assertEqual(next(sale_records(sales()))['total'], 24)
+
+    def test_regular_user_sees_own_total(self):
+        buy_tickets(self.session, self.user, 2)
+        User.objects.create(username='other')
+        self.client.force_login(self.user)
+
+        [row] = self.client.get(reverse('user-list')).json()['results']
+        self.assertEqual((row['id'], row['total_spent']), (self.user.pk, 24))
+        response = self.client.get(reverse('user-detail', kwargs={'pk': self.user.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_spent'], 24)
+
+
+class GroupPurchaseTests(TestCase):
+    def setUp(self):
+        create_schedule(films_count=2, sessions_per_film=1)
+        self.sessions = list(Session.objects.filter(date=date.today()).order_by('id'))
+        self.user = User.objects.create(username='buyer')
+
+    def lines(self, *amounts):
+        return {'lines': [{'session': session.pk, 'amount': amount} for session, amount in zip(self.sessions, amounts)]}
+
+    def test_lines_are_bought_with_one_spend_entry(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            purchases = buy_group(self.user, [(self.sessions[0].pk, 2, None), (self.sessions[1].pk, 3, None)])
+
+        self.assertEqual([purchase.amount for purchase in purchases], [2, 3])
+        self.assertEqual(SpendEntry.objects.filter(buyer=self.user).count(), 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.total_spent, 2 * self.sessions[0].price + 3 * self.sessions[1].price)
+        self.assertEqual(
+            list(Session.objects.filter(pk__in=[s.pk for s in self.sessions]).order_by('id')
+                 .values_list('rest_of_seats', flat=True)),
+            [98, 97]
+        )
+
+    def test_failing_line_rolls_back_the_whole_group(self):
+        buy_tickets(self.sessions[1], self.user, 1, [(1, 1)])
+
+        with self.assertRaises(SoldOut):
+            buy_group(self.user, [(self.sessions[0].pk, 2, None), (self.sessions[1].pk, 1, [(1, 1)])])
+
+        self.assertEqual(Purchase.objects.filter(ticket=self.sessions[0]).count(), 0)
+        self.assertEqual(Session.objects.get(pk=self.sessions[0].pk).rest_of_seats, 100)
+
+    def test_api_validates_all_lines(self):
+        self.client.force_login(self.user)
+
+        lines = {'lines': [{'session': self.sessions[0].pk, 'amount': 60}, {'session': self.sessions[0].pk, 'amount': 50}]}
+        response = self.client.post(reverse('group-purchase'), lines, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(reverse('group-purchase'), self.lines(2, 1), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([purchase['ticket'] for purchase in response.json()], [s.pk for s in self.sessions])
+
+    def test_query_count_does_not_depend_on_lines(self):
+        self.client.force_login(self.user)
+        self.client.get('/cart/')
+        counts = []
+        for amounts in ((1,), (1, 1)):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(reverse('group-purchase'), self.lines(*amounts), content_type='application/json')
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+
+class CartTests(TestCase):
+    def setUp(self):
+        create_schedule(films_count=2)
+        self.sessions = list(Session.objects.all())
+        self.user = User.objects.create(username='buyer')
+        self.other = User.objects.create(username='other')
+        self.client.force_login(self.user)
+        self.client.get('/cart/')
+
+    def buy(self, buyer, count):
+        for i in range(count):
+            session = self.sessions[i % len(self.sessions)]
+            Purchase.objects.create(amount=1, price=session.price, ticket=session, buyer=buyer)
+
+    def count_cart_queries(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/cart/', params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_cart_only_shows_own_purchases_in_pages(self):
+        self.buy(self.user, 25)
+        self.buy(self.other, 5)
+
+        _, response = self.count_cart_queries()
+        self.assertEqual(len(response.context['purchase_list']), 20)
+        self.assertTrue(all(purchase.buyer_id == self.user.pk for purchase in response.context['purchase_list']))
+
+        _, response = self.count_cart_queries(before=response.context['next_before'])
+        self.assertEqual(len(response.context['purchase_list']), 5)
+        self.assertNotIn('next_before', response.context)
+
+    def test_cart_queries_do_not_grow_with_sales(self):
+        self.buy(self.user, 3)
+        small, _ = self.count_cart_queries(summary='session')
+
+        self.buy(self.user, 30)
+        self.buy(self.other, 30)
+        large, response = self.count_cart_queries(summary='session')
+
+        self.assertEqual(small, large)
+        self.assertEqual(sum(row['tickets'] for row in response.context['summary_rows']), 33)
+
+    def test_summaries_keep_films_and_halls_with_the_same_name_apart(self):
+        first = self.sessions[0]
+        second = next(session for session in self.sessions if session.hall_id != first.hall_id)
+        Film.objects.filter(pk=second.film_id).update(name=first.film.name)
+        Hall.objects.filter(pk=second.hall_id).update(name=first.hall.name)
+        Session.objects.filter(pk=second.pk).update(date=first.date, time_start=first.time_start)
+        for session in (first, second):
+            Purchase.objects.create(amount=1, price=session.price, ticket=session, buyer=self.user)
+
+        for summary in ('film', 'session'):
+            _, response = self.count_cart_queries(summary=summary)
+            self.assertEqual(len(response.context['summary_rows']), 2, summary)
+
+class InactivityMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='viewer')
+        self.client.force_login(self.user)
+
+    def session_writes(self, path='/'):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(path)
+        return [query for query in queries if 'django_session' in query['sql']
+                and not query['sql'].startswith('SELECT')]
+
+    def test_steady_browsing_does_not_write_the_session(self):
+        self.client.get('/')
+        self.assertIsInstance(self.client.session['last_action'], int)
+
+        for _ in range(5):
+            self.assertEqual(self.session_writes(), [])
+        self.assertEqual(self.session_writes('/api/film/'), [])
+
+    def test_idle_user_is_logged_out(self):
+        session = self.client.session
+        session['last_action'] = int(time_now()) - 2 * 24 * 60 * 60
+        session.save()
+
+        response = self.client.get('/cart/')
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+
+class DeploymentCheckTests(SimpleTestCase):
+    local_cache = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+    def errors(self):
+        return [error.id for error in checks.check_shared_cache(None) + checks.check_session_cache(None)
+                + checks.check_idle_timeout(None)]
+
+    def test_configured_settings_pass(self):
+        self.assertEqual(self.errors(), [])
+
+    @override_settings(TESTING=False, CACHES=local_cache)
+    def test_process_local_cache_is_rejected_outside_tests(self):
+        self.assertEqual(self.errors(), ['cinema_app.E001', 'cinema_app.E002'])
+
+        with self.settings(SESSION_ENGINE='django.contrib.sessions.backends.db'):
+            self.assertEqual(self.errors(), ['cinema_app.E001'])
+
+    @override_settings(INACTIVE_USER_TIMEOUT=60, INACTIVE_USER_WRITE_GRANULARITY=15, SEAT_HOLD_TTL=600)
+    def test_idle_timeout_must_outlast_seat_holds(self):
+        self.assertEqual(self.errors(), ['cinema_app.E003'])
+
+
+class KeysetPaginationTests(TestCase):
+    def test_session_pages_cover_every_row_once(self):
+        create_schedule(films_count=7)
+        expected = list(Session.objects.order_by('date', 'time_start', 'id').values_list('id', flat=True))
+
+        seen, url, query_counts = [], '/api/session/?page_size=10', set()
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            query_counts.add(len(queries))
+            seen += [session['id'] for session in response.json()['results']]
+            url = response.json()['next']
+
+        self.assertEqual(seen, expected)
+        self.assertEqual(query_counts, {1})
+
+    def test_pages_cross_sessions_without_a_date(self):
+        create_schedule(films_count=3)
+        Session.objects.filter(pk__in=list(Session.objects.order_by('id').values_list('id', flat=True))[::4]) \
+            .update(date=None)
+        orderings = {
+            'date': (F('date').asc(nulls_last=True), 'time_start', 'id'),
+            '-date': (F('date').desc(nulls_first=True), '-time_start', '-id'),
+            'price': ('price', F('date').asc(nulls_last=True), 'time_start', 'id'),
+        }
+
+        for ordering, order_by in orderings.items():
+            seen, url = [], f'/api/session/?page_size=4&ordering={ordering}'
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                seen += [session['id'] for session in response.json()['results']]
+                url = response.json()['next']
+            self.assertEqual(seen, list(Session.objects.order_by(*order_by).values_list('id', flat=True)), ordering)
+
+    def test_oversized_page_size_and_invalid_cursor(self):
+        create_schedule(films_count=1)
+
+        response = self.client.get('/api/session/?page_size=100000')
+        self.assertEqual(len(response.json()['results']), 9)
+        self.assertIsNone(response.json()['next'])
+        self.assertEqual(self.client.get('/api/session/?cursor=bogus').status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_schedule(films_count=2)
+
+    def test_unchanged_list_answers_304_without_queries(self):
+        response = self.client.get('/api/session/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/session/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_checks_the_object_before_answering_304(self):
+        first, second = Session.objects.order_by('id')[:2]
+        etag = self.client.get(f'/api/session/{first.pk}/')['ETag']
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(f'/api/session/{first.pk}/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(f'/api/session/{second.pk}/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get('/api/session/999999/', HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_pages_and_filters_have_their_own_etags(self):
+        etag = self.client.get('/api/session/?page_size=2')['ETag']
+
+        self.assertEqual(self.client.get('/api/session/?page_size=3', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get('/api/session/?page_size=2', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_purchase_changes_session_etag(self):
+        etag = self.client.get('/api/session/')['ETag']
+        user = User.objects.create(username='buyer')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            buy_tickets(Session.objects.first(), user, 1)
+
+        response = self.client.get('/api/session/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get('/api/film/', HTTP_IF_NONE_MATCH=self.client.get('/api/film/')['ETag'])
+                         .status_code, 304)
+
+    def test_expired_version_is_never_answered_with_304(self):
+        response = self.client.get('/api/film/')
+        cache.delete('version:film')
+
+        response = self.client.get('/api/film/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/film/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+class FastSerializationTests(TestCase):
+    def test_fast_path_renders_identical_json(self):
+        create_schedule(films_count=3)
+        Session.objects.update(date=None)
+        Session.objects.filter(pk=Session.objects.first().pk).update(date=date.today())
+
+        for model, serializer_class in ((Session, SessionSerializer), (Film, FilmSerializer), (Hall, HallSerializer)):
+            queryset = model.objects.order_by('id')
+            fast_serializer = FastSerializer(serializer_class)
+
+            self.assertEqual(
+                JSONRenderer().render(fast_serializer.to_representation(fast_serializer.values(queryset))),
+                JSONRenderer().render(serializer_class(queryset, many=True).data)
+            )
+
+    def test_list_endpoint_matches_slow_path(self):
+        create_schedule(films_count=3)
+        fast = self.client.get('/api/session/?page_size=7').content
+
+        with patch.object(SessionModelViewSet, 'fast_list', False):
+            self.assertEqual(self.client.get('/api/session/?page_size=7').content, fast)
+
+
+class SessionSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.start = date(2024, 1, 1)
+        cls.films = [Film.objects.create(name=f'Film {i}', description='Description',
+                                         date_start=cls.start, date_finish=cls.start + timedelta(days=200))
+                     for i in range(10)]
+        cls.halls = [Hall.objects.create(name=f'Hall {i}', size=100) for i in range(20)]
+        Session.objects.bulk_create(
+            (
+                Session(date=cls.start + timedelta(days=day), time_start=time(10 + 3 * slot),
+                        time_end=time(12 + 3 * slot), price=5 + (day + slot) % 20, rest_of_seats=(day * slot) % 100,
+                        hall=hall, film=cls.films[(day + slot + number) % len(cls.films)])
+                for day in range(200) for slot in range(4) for number, hall in enumerate(cls.halls)
+            ),
+            batch_size=2000
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        markers = ('SEARCH',) if connection.vendor == 'sqlite' else ('Index Scan', 'Index Only Scan')
+        self.assertTrue(any(marker in plan for marker in markers), plan)
+
+    def test_common_filters_use_index_scans(self):
+        day = self.start + timedelta(days=100)
+        sessions = Session.objects.order_by('date', 'time_start', 'id')
+
+        self.assertUsesIndex(sessions.filter(date__gte=day, date__lte=day + timedelta(days=2)))
+        self.assertUsesIndex(sessions.filter(film=self.films[3], date__gte=day))
+        self.assertUsesIndex(sessions.filter(hall=self.halls[5], date=day))
+        self.assertUsesIndex(Session.objects.filter(date=day, price__lte=10).order_by('price'))
+
+    def test_search_endpoint_filters_and_orders(self):
+        response = self.client.get('/api/session/', {
+            'date_from': '2024-03-01', 'date_to': '2024-03-02', 'film': self.films[2].pk,
+            'min_seats': 10, 'price_max': 20, 'ordering': '-price', 'page_size': 500,
+        })
+        results = response.json()['results']
+        expected = Session.objects.filter(
+            date__range=(date(2024, 3, 1), date(2024, 3, 2)), film=self.films[2], rest_of_seats__gte=10, price__lte=20
+        )
+
+        self.assertEqual(sorted(session['id'] for session in results), sorted(expected.values_list('id', flat=True)))
+        self.assertEqual([session['price'] for session in results],
+                         sorted((session['price'] for session in results), reverse=True))
+
+    def test_invalid_filters_are_rejected(self):
+        response = self.client.get('/api/session/', {'date_from': 'yesterday', 'ordering': 'film'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryBudgetTests(TestCase):
+    sizes = (1, 4, 16)
+    max_seconds = 0.5
+    # (url name, method): (user, max queries, expected status)
+    budgets = {
+        ('base', 'get'): (None, 2, 200),
+        ('login', 'get'): (None, 0, 200),
+        ('logout', 'get'): ('buyer', 4, 302),
+        ('register', 'get'): (None, 0, 200),
+        ('create_hall', 'get'): ('admin', 2, 200),
+        ('create_session', 'get'): ('admin', 4, 200),
+        ('create_film', 'get'): ('admin', 2, 200),
+        ('purchase_detail', 'get'): ('buyer', 3, 200),
+        ('purchase_create', 'get'): ('buyer', 2, 200),
+        ('purchase_create', 'post'): ('buyer', 8, 302),
+        ('hold_confirm', 'get'): ('buyer', 3, 200),
+        ('hold_confirm', 'post'): ('buyer', 10, 302),
+        ('update_session', 'get'): ('admin', 5, 200),
+        ('update_hall', 'get'): ('admin', 3, 200),
+        ('cart', 'get'): ('buyer', 3, 200),
+        ('hall-list', 'get'): ('admin', 3, 200),
+        ('hall-detail', 'get'): ('admin', 3, 200),
+        ('film-list', 'get'): (None, 1, 200),
+        ('film-detail', 'get'): (None, 1, 200),
+        ('session-list', 'get'): (None, 1, 200),
+        ('session-detail', 'get'): (None, 1, 200),
+        ('session-seats', 'get'): (None, 2, 200),
+        ('purchase-list', 'get'): ('buyer', 3, 200),
+        ('purchase-list', 'post'): ('buyer', 10, 201),
+        ('purchase-detail', 'get'): ('buyer', 3, 200),
+        ('seathold-list', 'get'): ('buyer', 3, 200),
+        ('seathold-list', 'post'): ('buyer', 8, 201),
+        ('seathold-detail', 'get'): ('buyer', 3, 200),
+        ('seathold-confirm', 'post'): ('buyer', 10, 201),
+        ('user-list', 'get'): ('buyer', 3, 200),
+        ('user-detail', 'get'): ('buyer', 3, 200),
+        ('api_login', 'post'): (None, 2, 200),
+        ('group-purchase', 'post'): ('buyer', 9, 201),
+        ('slow-requests', 'get'): ('admin', 2, 200),
+        ('pool-metrics', 'get'): ('admin', 2, 200),
+        ('schedule-import', 'post'): ('admin', 8, 200),
+        ('sales-export', 'get'): ('admin', 2, 200),
+        ('sessionstats-list', 'get'): ('admin', 3, 200),
+        ('sessionstats-detail', 'get'): ('admin', 3, 200),
+        ('filmdaystats-list', 'get'): ('admin', 3, 200),
+        ('filmdaystats-detail', 'get'): ('admin', 3, 200),
+        ('halldaystats-list', 'get'): ('admin', 3, 200),
+        ('halldaystats-detail', 'get'): ('admin', 3, 200),
+        ('async_base', 'get'): ('buyer', 4, 200),
+        ('async_purchase_detail', 'get'): ('buyer', 3, 200),
+        ('async-session-seats', 'get'): (None, 1, 200),
+        ('seat-feed', 'get'): (None, 1, 200),
+        ('seat-stream', 'get'): (None, 0, 204),
+    }
+    redirects = {
+        ('logout', 'get'): 'base',
+        ('purchase_create', 'post'): 'hold_confirm',
+        ('hold_confirm', 'post'): 'cart',
+    }
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@cinema.test', 'password')
+        self.buyer = User.objects.create_user('buyer', password='password')
+        Token.objects.create(user=self.buyer)
+        self.loaded = 0
+
+    def grow(self, films_count):
+        for i in range(self.loaded, films_count):
+            hall = Hall.objects.create(name=f'Hall {i}', rows=5, seats_per_row=10)
+            film = Film.objects.create(name=f'Film {i}', description='Description',
+                                       date_start=date.today(), date_finish=date.today() + timedelta(days=1))
+            create_sessions(ScheduleRule(film, hall, 10 + i, [(time(10), time(12)), (time(14), time(16))]))
+            other = User.objects.create(username=f'other {i}')
+            for session in Session.objects.filter(film=film):
+                buy_tickets(session, self.buyer, 1)
+                buy_tickets(session, other, 2)
+                hold_seats(session, self.buyer, 1)
+        roll_up_sales()
+        self.loaded = films_count
+
+    def request_args(self, name, method):
+        session = Session.objects.order_by('id').first()
+        hold = SeatHold.objects.filter(buyer=self.buyer, session=session).order_by('id').first()
+        purchase = Purchase.objects.filter(buyer=self.buyer).order_by('id').first()
+        kwargs = {
+            'purchase_detail': {'pk': session.pk},
+            'async_purchase_detail': {'pk': session.pk},
+            'async-session-seats': {'pk': session.pk},
+            'purchase_create': {'session_id': session.pk},
+            'hold_confirm': {'pk': hold.pk},
+            'update_session': {'pk': session.pk},
+            'update_hall': {'pk': session.hall_id},
+            'hall-detail': {'pk': session.hall_id},
+            'film-detail': {'pk': session.film_id},
+            'session-detail': {'pk': session.pk},
+            'session-seats': {'pk': session.pk},
+            'purchase-list': {'session_id': session.pk},
+            'purchase-detail': {'session_id': session.pk, 'pk': purchase.pk},
+            'seathold-list': {'session_id': session.pk},
+            'seathold-detail': {'session_id': session.pk, 'pk': hold.pk},
+            'seathold-confirm': {'session_id': session.pk, 'pk': hold.pk},
+            'user-detail': {'pk': self.buyer.pk},
+            'sessionstats-detail': {'pk': session.pk},
+            'filmdaystats-detail': {'pk': FilmDayStats.objects.order_by('id').values_list('id', flat=True).first()},
+            'halldaystats-detail': {'pk': HallDayStats.objects.order_by('id').values_list('id', flat=True).first()},
+        }.get(name, {})
+        data = {
+            ('seat-feed', 'get'): {'watch': f'{session.pk}:-1'},
+            ('seat-stream', 'get'): {'watch': f'{session.pk}:-1'},
+            ('purchase_create', 'post'): {'amount': 1},
+            ('hold_confirm', 'post'): {'action': 'confirm'},
+            ('purchase-list', 'post'): {'amount': 1, 'ticket': session.pk},
+            ('seathold-list', 'post'): {'amount': 1},
+            ('api_login', 'post'): {'username': 'buyer', 'password': 'password'},
+            ('schedule-import', 'post'): {'file': SimpleUploadedFile('schedule.csv', (
+                'film,hall,date,time_start,time_end,price\n'
+                f'{session.film.name},{session.hall.name},{session.date},{session.time_start},{session.time_end},{session.price}\n'
+            ).encode())},
+            ('group-purchase', 'post'): {'lines': [
+                {'session': pk, 'amount': 1} for pk in Session.objects.order_by('id').values_list('id', flat=True)[:2]
+            ]},
+        }.get((name, method), {})
+        return reverse(name, kwargs=kwargs), data
+
+    def measure(self, name, method):
+        user, _, status = self.budgets[name, method]
+        url, data = self.request_args(name, method)
+        client = Client()
+        if user:
+            client.force_login(getattr(self, user))
+            client.get('/cart/')
+        extra = {'content_type': 'application/json'} if any(isinstance(value, list) for value in data.values()) else {}
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            started = perf_counter()
+            response = getattr(client, method)(url, data, **extra)
+            elapsed = perf_counter() - started
+
+        self.assertEqual(response.status_code, status, f'{method.upper()} {url}')
+        if (name, method) in self.redirects:
+            self.assertEqual(resolve(response['Location']).url_name, self.redirects[name, method], f'{method.upper()} {url}')
+        return len(queries), elapsed
+
+    def test_every_route_has_a_budget(self):
+        names = set()
+        for pattern in django_cinema.urls.urlpatterns + cinema_app.API.urls.urlpatterns + cinema_app.API.urls.router.urls:
+            if getattr(pattern, 'name', None):
+                names.add(pattern.name)
+        self.assertEqual(names - {name for name, _ in self.budgets}, set())
+
+    def test_query_counts_stay_within_budget_and_flat(self):
+        counts = {route: [] for route in self.budgets}
+
+        for size in self.sizes:
+            self.grow(size)
+            for route in self.budgets:
+                queries, elapsed = self.measure(*route)
+                counts[route].append(queries)
+                self.assertLess(elapsed, self.max_seconds, f'{route} took {elapsed:.3f}s at size {size}')
+
+        for route, route_counts in counts.items():
+            self.assertEqual(len(set(route_counts)), 1, f'{route} grows with data: {route_counts}')
+            self.assertLessEqual(route_counts[0], self.budgets[route][1], f'{route} is over budget')
+
+
+@patch('cinema_app.middlewares.PROFILER_SAMPLE_RATE', 1)
+class RequestProfilerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_schedule(3)
+        self.admin = User.objects.create_superuser('admin', 'admin@cinema.test', 'password')
+
+    def test_server_timing_reports_queries(self):
+        response = self.client.get('/api/film/')
+
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('queries"', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_not_sampled_requests_have_no_header(self):
+        with patch('cinema_app.middlewares.PROFILER_SAMPLE_RATE', 0):
+            response = self.client.get('/api/film/')
+
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @patch('cinema_app.middlewares.PROFILER_SLOW_REQUEST_MS', 0)
+    def test_slow_requests_are_recorded(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse('update_session', kwargs={'pk': Session.objects.first().pk}))
+
+        entry = middlewares.recent_slow_requests()[0]
+        self.assertEqual(entry['path'], reverse('update_session', kwargs={'pk': Session.objects.first().pk}))
+        self.assertTrue(entry['sampled'])
+        self.assertGreater(entry['queries'], 0)
+        self.assertLessEqual(len(entry['slowest']), middlewares.PROFILER_SLOWEST_STATEMENTS)
+
+    @patch('cinema_app.middlewares.PROFILER_SLOW_REQUEST_MS', 0)
+    def test_async_requests_are_sampled_too(self):
+        async def get():
+            return await AsyncClient().get(reverse('async_base'))
+
+        timing = async_to_sync(get)()['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertNotIn('"0 queries"', timing)
+        self.assertGreater(middlewares.recent_slow_requests()[0]['queries'], 0)
+
+    @patch('cinema_app.middlewares.PROFILER_RECENT_SLOW', 2)
+    def test_slow_request_log_is_a_shared_ring(self):
+        for path in ('/a', '/b', '/c'):
+            middlewares.add_slow_request({'path': path})
+
+        self.assertEqual([entry['path'] for entry in middlewares.recent_slow_requests()], ['/c', '/b'])
+
+    def test_recorder_groups_duplicate_statements(self):
+        recorder = middlewares.QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for session in Session.objects.order_by('id'):
+                session.hall.name
+
+        self.assertEqual(list(recorder.duplicates().values()), [Session.objects.count()])
+
+    @patch('cinema_app.middlewares.PROFILER_SLOW_REQUEST_MS', 0)
+    def test_slow_request_endpoint_is_admin_only(self):
+        self.client.get('/api/film/')
+        self.assertEqual(self.client.get(reverse('slow-requests')).status_code, 403)
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('slow-requests'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[-1]['path'], '/api/film/')
+
+
+class AsyncReadTests(TestCase):
+    def setUp(self):
+        create_schedule(3)
+        self.session = Session.objects.filter(date=date.today()).order_by('id').first()
+        self.user = User.objects.create(username='buyer')
+        buy_tickets(self.session, self.user, 3)
+
+    def test_async_schedule_matches_sync_page(self):
+        self.client.force_login(self.user)
+        for query in ('', '?sort_by=price', '?day=tomorrow&sort_by=time'):
+            cache.clear()
+            sync_page = self.client.get('/' + query).content
+            cache.clear()
+            async_page = self.client.get(reverse('async_base') + query).content
+            self.assertEqual(async_page, sync_page)
+
+    def test_async_film_detail_matches_sync_page(self):
+        sync_page = self.client.get(reverse('purchase_detail', kwargs={'pk': self.session.pk}))
+        async_page = self.client.get(reverse('async_purchase_detail', kwargs={'pk': self.session.pk}))
+
+        self.assertEqual(async_page.status_code, 200)
+        self.assertEqual(async_page.context['seat_rows'], sync_page.context['seat_rows'])
+        self.assertEqual(self.client.get(reverse('async_purchase_detail', kwargs={'pk': 0})).status_code, 404)
+
+    async def test_async_seats_match_api(self):
+        url = reverse('async-session-seats', kwargs={'pk': self.session.pk})
+        api_url = reverse('session-seats', kwargs={'pk': self.session.pk})
+
+        response = await self.async_client.get(url, {'amount': 2})
+        api_response = await self.async_client.get(api_url, {'amount': 2})
+
+        self.assertEqual(response.json(), api_response.json())
+        self.assertEqual(response.json()['rest_of_seats'], 97)
+
+
+class SeatFeedTests(TestCase):
+    def setUp(self):
+        create_schedule(2, sessions_per_film=1)
+        self.sessions = list(Session.objects.filter(date=date.today()).order_by('id'))
+        self.user = User.objects.create(username='buyer')
+
+    def version(self, session):
+        return Session.objects.get(pk=session.pk).seats_version
+
+    def test_purchase_paths_bump_the_version(self):
+        session = self.sessions[0]
+        buy_tickets(session, self.user, 1)
+        self.assertEqual(self.version(session), 1)
+
+        hold = hold_seats(session, self.user, 2)
+        self.assertEqual(self.version(session), 2)
+        confirm_hold(hold)
+        self.assertEqual(self.version(session), 2)
+
+        buy_group(self.user, [(s.pk, 1, None) for s in self.sessions])
+        self.assertEqual([self.version(s) for s in self.sessions], [3, 1])
+
+    def test_one_poll_serves_every_watcher(self):
+        buy_tickets(self.sessions[0], self.user, 3)
+
+        async def watch():
+            feed = SeatFeed(interval=60)
+            watchers = [feed.subscribe({self.sessions[0].pk: 0}) for _ in range(50)]
+            watchers.append(feed.subscribe({self.sessions[0].pk: 1, self.sessions[1].pk: 0}))
+            feed.task.cancel()
+            await feed.poll()
+            return [watcher.drain() for watcher in watchers]
+
+        with self.assertNumQueries(1):
+            deltas = async_to_sync(watch)()
+
+        self.assertTrue(all(len(watcher_deltas) == 1 for watcher_deltas in deltas[:50]))
+        self.assertEqual(deltas[0][0]['rest_of_seats'], 97)
+        self.assertEqual(''.join(deltas[0][0]['map']).count('X'), 3)
+        self.assertEqual(deltas[-1], [])
+
+    def test_long_poll_returns_only_newer_versions(self):
+        url = reverse('seat-feed')
+        buy_tickets(self.sessions[0], self.user, 1)
+
+        deltas = self.client.get(url, {'watch': f'{self.sessions[0].pk}:0,{self.sessions[1].pk}:0'}).json()
+        self.assertEqual([(delta['session'], delta['version']) for delta in deltas], [(self.sessions[0].pk, 1)])
+
+        self.assertEqual(self.client.get(url, {'watch': f'{self.sessions[0].pk}:1', 'timeout': 0.05}).json(), [])
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+    def test_parse_watch(self):
+        self.assertEqual(parse_watch('1:5, 2,x:3,4:y'), {1: 5, 2: -1, 4: -1})
+
+    def test_detail_page_streams_only_under_asgi(self):
+        session = self.sessions[0]
+        url = reverse('async_purchase_detail', kwargs={'pk': session.pk})
+        wsgi = self.client.get(url).content.decode()
+        self.assertNotIn('EventSource', wsgi)
+        self.assertIn(reverse('seat-feed'), wsgi)
+        self.assertEqual(self.client.get(reverse('seat-stream'), {'watch': f'{session.pk}:0'}).status_code, 204)
+
+        async def page():
+            return await AsyncClient().get(url)
+
+        self.assertIn('EventSource', async_to_sync(page)().content.decode())
+
+    @patch('cinema_app.async_views.SEAT_FEED_HEARTBEAT', 0.05)
+    @patch('cinema_app.async_views.SEAT_STREAM_LIFETIME', 0.2)
+    def test_stream_ends_with_a_retry_hint(self):
+        session = self.sessions[0]
+        buy_tickets(session, self.user, 1)
+
+        async def stream():
+            response = await AsyncClient().get(
+                reverse('seat-stream'), {'watch': f'{session.pk}:0'}, HTTP_LAST_EVENT_ID=f'{self.sessions[1].pk}:9'
+            )
+            return [chunk.decode() async for chunk in response.streaming_content]
+
+        chunks = async_to_sync(stream)()
+        self.assertEqual(chunks[-1], 'retry: 3000\n\n')
+        self.assertEqual([chunk.split('\n')[0] for chunk in chunks if 'event: seats' in chunk], [f'id: {session.pk}:1'])
+
+
+@patch('cinema_app.routers.replicas', lambda: ['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        create_schedule(1, sessions_per_film=1)
+        self.session = Session.objects.filter(date=date.today()).first()
+        self.user = User.objects.create(username='buyer')
+        cache.clear()
+
+    def count_queries(self, request):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            request()
+        return len(primary), len(replica)
+
+    def test_safe_reads_go_to_the_replica(self):
+        for url in ('/', reverse('purchase_detail', kwargs={'pk': self.session.pk}), reverse('film-list')):
+            primary, replica = self.count_queries(lambda: self.client.get(url))
+            self.assertEqual(primary, 0, url)
+            self.assertGreater(replica, 0, url)
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        self.client.force_login(self.user)
+        url = reverse('purchase-list', kwargs={'session_id': self.session.pk})
+
+        response = self.client.post(url, {'amount': 1, 'ticket': self.session.pk})
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('primary_until', response.cookies)
+
+        primary, replica = self.count_queries(lambda: self.client.get('/cart/'))
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+
+        self.client.cookies.pop('primary_until')
+        primary, replica = self.count_queries(lambda: self.client.get(reverse('film-list')))
+        self.assertEqual(primary, 0)
+
+    @patch('cinema_app.middlewares.INACTIVE_USER_WRITE_GRANULARITY', -1)
+    def test_session_bookkeeping_does_not_pin_reads_to_the_primary(self):
+        self.client.force_login(self.user)
+        for _ in range(2):
+            response = self.client.get('/')
+            self.assertNotIn('primary_until', response.cookies)
+        self.assertIn('last_action', self.client.session)
+
+        with replica_reads():
+            self.assertEqual(ReplicaRouter().db_for_read(DjangoSession), 'default')
+
+    def test_locking_reads_and_writes_use_the_primary(self):
+        router = ReplicaRouter()
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Film), 'replica')
+            self.assertEqual(Session.objects.select_for_update().db, 'default')
+            self.assertEqual(router.db_for_write(Film), 'default')
+            self.assertEqual(router.db_for_read(Film), 'default')
+        self.assertEqual(router.db_for_read(Film), 'default')
+
+
+class ConnectionPoolTests(TestCase):
+    def setUp(self):
+        pooling.metrics.reset()
+
+    def test_requests_check_connections_out_and_in(self):
+        self.client.get(reverse('film-list'))
+        self.client.get(reverse('film-list'))
+
+        snapshot = pooling.metrics.snapshot()
+        self.assertEqual((snapshot['checkouts'], snapshot['reused'], snapshot['in_use']), (2, 2, 0))
+
+    def test_streamed_responses_hold_the_connection_until_closed(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@cinema.test', 'password'))
+        pooling.metrics.reset()
+
+        response = self.client.get(reverse('sales-export'), {'type': 'jsonl'})
+        self.assertEqual(pooling.metrics.snapshot()['in_use'], 1)
+        b''.join(response.streaming_content)
+        self.assertEqual(pooling.metrics.snapshot()['in_use'], 0)
+
+    def test_unread_streams_release_the_connection_on_close(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@cinema.test', 'password'))
+        pooling.metrics.reset()
+
+        response = self.client.get(reverse('sales-export'), {'type': 'jsonl'})
+        response.close()
+        response.close()
+        self.assertEqual(pooling.metrics.snapshot()['in_use'], 0)
+
+    def test_async_requests_are_pooled(self):
+        async def get():
+            response = await AsyncClient().get(reverse('async_base'))
+            return response, pooling.metrics.snapshot()
+
+        with patch('cinema_app.pooling.slots', BoundedSemaphore(1)):
+            response, snapshot = async_to_sync(get)()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((snapshot['checkouts'], snapshot['in_use']), (1, 0))
+
+    @patch('cinema_app.pooling.DB_POOL_TIMEOUT', 0.01)
+    def test_exhausted_pool_answers_503(self):
+        with patch('cinema_app.pooling.slots', BoundedSemaphore(1)) as slots:
+            slots.acquire()
+            response = self.client.get(reverse('film-list'))
+            slots.release()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        snapshot = pooling.metrics.snapshot()
+        self.assertEqual((snapshot['waits'], snapshot['timeouts'], snapshot['checkouts']), (1, 1, 0))
+
+    def test_broken_connections_are_discarded(self):
+        broken = Mock(connection=object(), errors_occurred=True, **{'is_usable.return_value': False})
+        healthy = Mock(connection=object(), errors_occurred=True, **{'is_usable.return_value': True})
+
+        with patch('cinema_app.pooling.connections', Mock(**{'all.return_value': [broken, healthy]})):
+            pooling.discard_broken()
+
+        broken.close.assert_called_once()
+        healthy.close.assert_not_called()
+        self.assertEqual(pooling.metrics.snapshot()['discarded'], 1)
+
+
+class ScheduleImportTests(TestCase):
+    header = 'film,description,hall,rows,seats_per_row,date,time_start,time_end,price\n'
+
+    def csv(self, days=3, hall='Red'):
+        day = date.today()
+        return [self.header] + [
+            f'Dune,Sand,{hall},5,10,{day + timedelta(days=i)},{start}:00,{start + 2}:00,12\n'
+            for i in range(days) for start in (10, 14)
+        ]
+
+    def test_import_creates_films_halls_and_sessions_in_chunks(self):
+        summary = import_schedule(self.csv(), chunk_size=4)
+
+        self.assertEqual((summary['rows'], summary['created'], summary['failed']), (6, 6, 0))
+        hall = Hall.objects.get(name='Red')
+        film = Film.objects.get(name='Dune')
+        self.assertEqual(hall.size, 50)
+        self.assertEqual((film.date_start, film.date_finish), (date.today(), date.today() + timedelta(days=2)))
+        self.assertEqual(set(Session.objects.values_list('rest_of_seats', flat=True)), {50})
+
+    def test_rerun_is_idempotent(self):
+        import_schedule(self.csv())
+        summary = import_schedule(self.csv())
+
+        self.assertEqual((summary['created'], summary['skipped'], summary['failed']), (0, 6, 0))
+        self.assertEqual(Session.objects.count(), 6)
+        self.assertEqual((Hall.objects.count(), Film.objects.count()), (1, 1))
+
+    def test_bad_and_conflicting_rows_are_reported_by_line(self):
+        day = date.today()
+        lines = self.csv(days=1) + [
+            f'Alien,Space,Red,,,{day},11:00,12:00,10\n',
+            f'Alien,Space,Blue,,,{day},11:00,12:00,10\n',
+            f'Alien,Space,Red,,,{day},18:00,17:00,10\n',
+            'Alien,Space,Red,,,tomorrow,18:00,19:00,10\n',
+        ]
+        summary = import_schedule(lines)
+
+        self.assertEqual((summary['created'], summary['failed']), (2, 4))
+        self.assertEqual([error['line'] for error in summary['errors']], [6, 7, 5, 4])
+        self.assertIn('Unknown hall', summary['errors'][2]['error'])
+        self.assertIn('Overlaps', summary['errors'][3]['error'])
+
+    def test_jsonl_import(self):
+        lines = [
+            '{"film": "Dune", "hall": "Red", "rows": 2, "seats_per_row": 5, "date": "%s",'
+            ' "time_start": "10:00", "time_end": "12:00", "price": 9}\n' % date.today(),
+            'not json\n',
+        ]
+        summary = import_schedule(lines, 'jsonl')
+
+        self.assertEqual((summary['created'], summary['failed']), (1, 1))
+        self.assertEqual(summary['errors'][0]['line'], 2)
+
+    def test_management_command_reads_the_file(self):
+        with NamedTemporaryFile('w', suffix='.csv') as file:
+            file.writelines(self.csv())
+            file.flush()
+            call_command('import_schedule', file.name, '--chunk-size', '2', stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(Session.objects.count(), 6)
+
+    def test_api_import_is_admin_only(self):
+        upload = SimpleUploadedFile('schedule.csv', ''.join(self.csv()).encode())
+        buyer = User.objects.create(username='buyer')
+        self.client.force_login(buyer)
+        self.assertEqual(self.client.post(reverse('schedule-import'), {'file': upload}).status_code, 403)
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@cinema.test', 'password'))
+        upload.seek(0)
+        response = self.client.post(reverse('schedule-import'), {'file': upload})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 6)
+
+
+class SalesExportTests(TestCase):
+    def setUp(self):
+        create_schedule(2, sessions_per_film=2)
+        self.buyer = User.objects.create(username='buyer')
+        for session in Session.objects.order_by('id'):
+            buy_tickets(session, self.buyer, 2)
+        self.film = Film.objects.order_by('id').first()
+
+    def test_csv_export_joins_session_film_hall_and_buyer(self):
+        with self.assertNumQueries(1):
+            lines = list(export_sales('csv', chunk_size=2))
+
+        self.assertEqual(len(lines), 13)
+        self.assertTrue(lines[0].startswith('purchase,session,date,'))
+        purchase = Purchase.objects.select_related('ticket__film', 'ticket__hall').order_by('id').first()
+        self.assertEqual(lines[1].strip().split(','), [
+            str(purchase.pk), str(purchase.ticket_id), str(purchase.ticket.date),
+            str(purchase.ticket.time_start), str(purchase.ticket.time_end),
+            str(purchase.ticket.film_id), purchase.ticket.film.name,
+            str(purchase.ticket.hall_id), purchase.ticket.hall.name,
+            str(self.buyer.pk), 'buyer', '2', str(purchase.ticket.price),
+            ' '.join(f'{seat["row"]}-{seat["seat"]}' for seat in purchase.seats),
+            str(2 * purchase.ticket.price),
+        ])
+
+    def test_filters_by_film_and_date(self):
+        lines = list(export_sales('jsonl', film=self.film.pk, date_from=date.today(), date_to=date.today()))
+
+        self.assertEqual(len(lines), 2)
+        self.assertEqual({json.loads(line)['film_id'] for line in lines}, {self.film.pk})
+        self.assertEqual(list(export_sales('jsonl', date_from=date.today() + timedelta(days=2))), [])
+
+    def test_management_command_writes_the_export(self):
+        out = StringIO()
+        call_command('export_sales', '--format', 'jsonl', '--film', str(self.film.pk), stdout=out)
+
+        self.assertEqual(len(out.getvalue().splitlines()), 6)
+
+    def test_api_streams_the_export_to_admins_only(self):
+        self.client.force_login(self.buyer)
+        self.assertEqual(self.client.get(reverse('sales-export')).status_code, 403)
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@cinema.test', 'password'))
+        response = self.client.get(reverse('sales-export'), {'type': 'jsonl', 'film': self.film.pk})
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 6)
+
+        response = self.client.get(reverse('sales-export'), {'date_from': '2024-02-01', 'date_to': '2024-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SalesStatsTests(TestCase):
+    def setUp(self):
+        create_schedule(2, sessions_per_film=2)
+        self.buyer = User.objects.create(username='buyer')
+        self.sessions = list(Session.objects.filter(date=date.today()).select_related('hall').order_by('id'))
+
+    def stats(self):
+        return (
+            sorted(SessionStats.objects.values_list('session_id', 'tickets', 'revenue')),
+            sorted(FilmDayStats.objects.values_list('film_id', 'date', 'tickets', 'revenue')),
+            sorted(HallDayStats.objects.values_list('hall_id', 'date', 'sessions', 'capacity', 'tickets', 'revenue')),
+        )
+
+    def test_purchases_update_summaries_after_commit(self):
+        first, second = self.sessions[:2]
+        with self.captureOnCommitCallbacks(execute=True):
+            buy_tickets(first, self.buyer, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            buy_group(self.buyer, [(first.pk, 1, None), (second.pk, 3, None)])
+
+        self.assertEqual(SessionStats.objects.get(session=first).tickets, 3)
+        film_day = FilmDayStats.objects.get(film=first.film_id, date=date.today())
+        self.assertEqual((film_day.tickets, film_day.revenue), (6, 3 * first.price + 3 * second.price))
+        hall_day = HallDayStats.objects.get(hall=first.hall_id, date=date.today())
+        self.assertEqual((hall_day.sessions, hall_day.capacity, hall_day.tickets), (2, 200, 6))
+        self.assertFalse(Purchase.objects.filter(counted=False).exists())
+
+    def test_session_changes_refresh_hall_capacity(self):
+        first = self.sessions[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            buy_tickets(first, self.buyer, 1)
+
+        def capacity():
+            return HallDayStats.objects.values_list('sessions', 'capacity').get(hall=first.hall_id, date=date.today())
+
+        self.assertEqual(capacity(), (2, 200))
+        rule = ScheduleRule(first.film, first.hall, 10, [(time(6), time(7))],
+                            date_start=date.today(), date_finish=date.today())
+        with self.captureOnCommitCallbacks(execute=True):
+            create_sessions(rule)
+        self.assertEqual(capacity(), (3, 300))
+
+        added = Session.objects.get(hall=first.hall_id, date=date.today(), time_start=time(6))
+        added.date += timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            added.save()
+        self.assertEqual(capacity(), (2, 200))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Session.objects.get(pk=self.sessions[1].pk).delete()
+        self.assertEqual(capacity(), (1, 100))
+
+    def test_roll_up_matches_rebuild(self):
+        for session in self.sessions:
+            buy_tickets(session, self.buyer, 2)
+        Session.objects.filter(pk=self.sessions[0].pk).update(date=None)
+
+        self.assertEqual(roll_up_sales(batch_size=3), 4)
+        self.assertEqual(roll_up_sales(), 0)
+        rolled_up = self.stats()
+
+        self.assertEqual(rebuild_sales_stats()['sessions'], 4)
+        rebuilt = self.stats()
+        self.assertEqual(rolled_up[:2], rebuilt[:2])
+        self.assertEqual([row for row in rebuilt[2] if row[4]], rolled_up[2])
+
+    def test_analytics_endpoints_are_admin_only_and_filtered(self):
+        for session in self.sessions:
+            buy_tickets(session, self.buyer, 5)
+        roll_up_sales()
+
+        self.client.force_login(self.buyer)
+        self.assertEqual(self.client.get(reverse('halldaystats-list')).status_code, 403)
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@cinema.test', 'password'))
+        hall = self.sessions[0].hall
+        response = self.client.get(reverse('halldaystats-list'), {'hall': hall.pk})
+        self.assertEqual(response.status_code, 200)
+        [row] = response.json()['results']
+        self.assertEqual((row['hall_name'], row['tickets'], row['capacity'], row['occupancy']), (hall.name, 10, 200, 0.05))
+
+        response = self.client.get(reverse('filmdaystats-list'), {'date_from': date.today() + timedelta(days=1)})
+        self.assertEqual(response.json()['results'], [])
+        response = self.client.get(reverse('sessionstats-detail', kwargs={'pk': self.sessions[0].pk}))
+        self.assertEqual(response.json()['occupancy'], 0.05)
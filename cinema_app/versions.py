@@ -0,0 +1,22 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_TIMEOUT = getattr(settings, 'API_VERSION_TIMEOUT', 300)
+
+
+def _key(name):
+    return f'version:{name}'
+
+
+def bump(*names):
+    cache.set_many({_key(name): uuid4().hex for name in names}, VERSION_TIMEOUT)
+
+
+def get_version(name):
+    version = cache.get(_key(name))
+    if version is None:
+        cache.add(_key(name), uuid4().hex, VERSION_TIMEOUT)
+        version = cache.get(_key(name))
+    return version
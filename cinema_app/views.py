@@ -1,11 +1,45 @@
 from datetime import timedelta, date
+from django.contrib import messages
 from django.contrib.auth.mixins import UserPassesTestMixin, LoginRequiredMixin
 from django.contrib.auth.views import LoginView, LogoutView
-from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
 from django.shortcuts import redirect
 from django.views.generic import CreateView, ListView, UpdateView, DetailView
-from cinema_app.forms import UserForm, HallForm, SessionForm, FilmForm, PurchaseForm
-from cinema_app.models import Session, Film, Purchase, Hall
+from cinema_app.forms import UserForm, HallForm, SessionForm, SessionUpdateForm, FilmForm, PurchaseForm
+from cinema_app.models import Session, Film, Purchase, Hall, SeatHold
+from cinema_app.purchases import hold_seats, confirm_hold, release_hold, SoldOut, HoldExpired
+from cinema_app.recurrence import create_sessions
+from cinema_app.schedule import get_schedule_snapshot
+
+
+def get_seat_rows(session):
+    return [
+        (row_number, [(seat_number, taken == 'X') for seat_number, taken in enumerate(row, start=1)])
+        for row_number, row in enumerate(session.get_seat_map().render(), start=1)
+    ]
+
+
+def get_seat_feed_context(request):
+    return {'seat_stream': isinstance(request, ASGIRequest)}
+
+
+def get_selected_date(request):
+    today = date.today()
+    if request.GET.get('day', 'today') == 'tomorrow':
+        return today + timedelta(days=1)
+    return today
+
+
+def get_schedule_context(request):
+    today = date.today()
+    return {
+        'sort_by': request.GET.get('sort_by', 'default'),
+        'day': request.GET.get('day', 'today'),
+        'today_date': today,
+        'tomorrow_date': today + timedelta(days=1),
+    }
 
 
 class AdminPassedMixin(UserPassesTestMixin):
@@ -57,29 +91,18 @@ class SessionCreateView(AdminPassedMixin, CreateView):
         return kwargs
 
     def form_valid(self, form):
-        obj = form.save(commit=False)
-        obj.rest_of_seats = form.size
-
-        date_start = obj.film.date_start
-        date_finish = obj.film.date_finish
-
-        delta = timedelta(days=1)
-        date = date_start
-        while date <= date_finish:
-            session = Session(
-                date=date,
-                time_start=obj.time_start,
-                time_end=obj.time_end,
-                price=obj.price,
-                rest_of_seats=form.size,
-                hall=obj.hall,
-                film=obj.film
-            )
-            session.save()
-            date += delta
-
-        obj.save()
-        return super().form_valid(form=form)
+        try:
+            summary = create_sessions(form.schedule_rule)
+        except IntegrityError:
+            messages.error(self.request, 'This session conflicts with an existing session.')
+            return redirect('/')
+
+        messages.success(
+            self.request,
+            f'Created {summary["created"]} sessions over {summary["days"]} days '
+            f'({summary["date_start"]} - {summary["date_finish"]})'
+        )
+        return redirect(self.success_url)
 
     def form_invalid(self, form):
         return redirect('/')
@@ -107,79 +130,76 @@ class FilmListView(ListView):
     context_object_name = 'films'
     template_name = 'film_list.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        today = date.today()
-        tomorrow = today + timedelta(days=1)
-
-        day_selected = self.request.GET.get('day', 'today')
-        sort_by_selected = self.request.GET.get('sort_by', 'default')
-
-        if day_selected == 'tomorrow':
-            selected_date = tomorrow
-        else:
-            selected_date = today
-
-        films_selected_day = Film.objects.filter(session__date=selected_date).distinct()
-        sessions_selected_day = Session.objects.filter(date=selected_date)
-
-        if sort_by_selected == 'price':
-            films_selected_day = films_selected_day.order_by('-session__price')
-        elif sort_by_selected == 'time':
-            films_selected_day = films_selected_day.order_by('session__time_start')
-
-        context['films'] = films_selected_day
-        context['sessions'] = sessions_selected_day
-        context['sort_by'] = sort_by_selected
-        context['day'] = day_selected
-        context['today_date'] = today
-        context['tomorrow_date'] = tomorrow
-
-        return context
-
     def get_queryset(self):
         sort_by = self.request.GET.get('sort_by', 'default')
-        today = date.today()
+        return get_schedule_snapshot(get_selected_date(self.request), sort_by)
 
-        if sort_by == 'price':
-            queryset = Film.objects.filter(session__date=today).order_by('session__price')
-        elif sort_by == 'time':
-            queryset = Film.objects.filter(session__date=today).order_by('session__time_start')
-        else:
-            queryset = Film.objects.filter(session__date=today)
-
-        return queryset
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(get_schedule_context(self.request))
+        return context
 
 
 class FilmDetailView(DetailView):
     model = Session
+    queryset = Session.objects.select_related('film', 'hall')
     template_name = 'detail_film.html'
     extra_context = {'form': PurchaseForm()}
     login_url = 'login/'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['seat_rows'] = get_seat_rows(self.object)
+        context.update(get_seat_feed_context(self.request))
+        return context
+
 
 class SessionUpdateView(AdminPassedMixin, UpdateView):
     model = Session
-    fields = ('time_start', 'time_end', 'price', 'hall', 'film',)
+    form_class = SessionUpdateForm
     template_name = 'update_session.html'
     queryset = Session.objects.all()
     success_url = '/'
     login_url = 'login/'
 
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs.update(
+            {'request': self.request}
+        )
+        return kwargs
+
+    def form_valid(self, form):
+        try:
+            with transaction.atomic():
+                return super().form_valid(form)
+        except IntegrityError:
+            form.add_error(None, 'Error')
+            messages.error(self.request, 'This session conflicts with an existing session.')
+            return self.form_invalid(form)
+
 
 class HallUpdateView(AdminPassedMixin, UpdateView):
     model = Hall
-    fields = ('name', 'size',)
+    form_class = HallForm
     template_name = 'update_hall.html'
     queryset = Hall.objects.all()
     success_url = '/'
     login_url = 'login/'
 
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs.update(
+            {'request': self.request}
+        )
+        return kwargs
+
 
-class PurchaseCreateView(CreateView):
+class PurchaseCreateView(LoginRequiredMixin, CreateView):
     form_class = PurchaseForm
     template_name = 'purchase_create.html'
     success_url = '/'
+    login_url = 'login/'
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
@@ -189,24 +209,82 @@ class PurchaseCreateView(CreateView):
         return kwargs
 
     def form_valid(self, form):
-        obj = form.save(commit=False)
-        obj.ticket = form.session
-        obj.buyer = self.request.user
-        total_money = obj.ticket.price * obj.amount
-        obj.buyer.total_spent += total_money
-        obj.ticket.rest_of_seats -= obj.amount
-        with transaction.atomic():
-            obj.ticket.save()
-            obj.buyer.save()
-            obj.save()
-        return super().form_valid(form=form)
+        try:
+            hold = hold_seats(form.session, self.request.user, form.cleaned_data['amount'], form.seats)
+        except SoldOut:
+            messages.error(self.request, 'Sorry, this session is sold out.')
+            return redirect(self.success_url)
+        return redirect('hold_confirm', pk=hold.pk)
 
     def form_invalid(self, form):
         return redirect('/')
 
 
+class HoldConfirmView(LoginRequiredMixin, DetailView):
+    model = SeatHold
+    template_name = 'hold_confirm.html'
+    context_object_name = 'hold'
+    login_url = 'login/'
+
+    def get_queryset(self):
+        return SeatHold.objects.filter(buyer=self.request.user).select_related('session__film', 'session__hall')
+
+    def post(self, request, *args, **kwargs):
+        hold = self.get_object()
+
+        if request.POST.get('action') == 'cancel':
+            release_hold(hold)
+            return redirect('/')
+
+        try:
+            confirm_hold(hold)
+        except HoldExpired:
+            messages.error(request, 'Your reservation has expired, please choose seats again.')
+            return redirect('purchase_detail', pk=hold.session_id)
+        return redirect('cart')
+
+
 class CartListView(LoginRequiredMixin, ListView):
     model = Purchase
+    context_object_name = 'purchase_list'
     template_name = 'cart.html'
-    queryset = Purchase.objects.all()
     login_url = 'login/'
+    page_size = 20
+    # summary: (group by, labels shown with each row)
+    summaries = {
+        'film': (('ticket__film_id',), ('ticket__film__name',)),
+        'session': (('ticket_id',), ('ticket__film__name', 'ticket__hall__name', 'ticket__date', 'ticket__time_start')),
+    }
+
+    def get_queryset(self):
+        queryset = Purchase.objects.filter(buyer=self.request.user).select_related(
+            'ticket__film', 'ticket__hall'
+        ).order_by('-id')
+
+        before = self.request.GET.get('before', '')
+        if before.isdigit():
+            queryset = queryset.filter(id__lt=int(before))
+
+        purchases = list(queryset[:self.page_size + 1])
+        self.has_next = len(purchases) > self.page_size
+        return purchases[:self.page_size]
+
+    def get_summary(self, group_by, labels):
+        return Purchase.objects.filter(buyer=self.request.user).values(*group_by, *labels).annotate(
+            tickets=Sum('amount'),
+            spent=Sum(F('amount') * F('price'))
+        ).order_by(*labels, *group_by)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        purchase_list = context['purchase_list']
+
+        if self.has_next:
+            context['next_before'] = purchase_list[-1].id
+
+        summary = self.request.GET.get('summary')
+        if summary in self.summaries:
+            context['summary'] = summary
+            context['summary_rows'] = self.get_summary(*self.summaries[summary])
+
+        return context
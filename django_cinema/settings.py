@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -26,6 +28,8 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+TESTING = sys.argv[1:2] == ['test']
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -35,15 +39,20 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'rest_framework.authtoken',
     'cinema_app',
 ]
 
 MIDDLEWARE = [
+    'cinema_app.middlewares.RequestProfilerMiddleware',
+    'cinema_app.middlewares.ConnectionPoolMiddleware',
+    'cinema_app.middlewares.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'cinema_app.middlewares.LogoutInactiveUserMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -79,8 +88,26 @@ DATABASES = {
         'PASSWORD': 'admin',
         'HOST': 'localhost',
         'PORT': '5432',
-    }
+        'CONN_MAX_AGE': int(os.environ.get('CINEMA_DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'NAME': os.environ.get('CINEMA_REPLICA_NAME', 'mycinemadb'),
+        'USER': 'myadmin',
+        'PASSWORD': 'admin',
+        'HOST': os.environ.get('CINEMA_REPLICA_HOST', 'localhost'),
+        'PORT': os.environ.get('CINEMA_REPLICA_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('CINEMA_DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    },
 }
+DATABASE_ROUTERS = ['cinema_app.routers.ReplicaRouter']
+REPLICA_DATABASES = ['replica']
+REPLICA_STICKY_SECONDS = 5
+DB_POOL_MAX_SIZE = 20
+DB_POOL_TIMEOUT = 5
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -122,3 +149,40 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'cinema_app.User'
 LOGIN_REDIRECT_URL = '/'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('CINEMA_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+    }
+}
+if TESTING:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'cinema',
+        }
+    }
+SCHEDULE_SNAPSHOT_TIMEOUT = 300
+API_VERSION_TIMEOUT = 300
+SEAT_HOLD_TTL = 600
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+INACTIVE_USER_TIMEOUT = 1800
+INACTIVE_USER_WRITE_GRANULARITY = 60
+PROFILER_SAMPLE_RATE = 0.01
+PROFILER_SLOW_REQUEST_MS = 500
+ASYNC_READ_CONCURRENCY = 100
+SEAT_FEED_INTERVAL = 1
+SEAT_FEED_TIMEOUT = 25
+SEAT_STREAM_LIFETIME = 300
+SEAT_STREAM_RETRY = 3000
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+        'rest_framework.authentication.TokenAuthentication',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'cinema_app.API.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+}
@@ -1,8 +1,9 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from cinema_app import async_views
 from cinema_app.views import Login, Logout, Register, HallCreateView, SessionCreateView, FilmCreateView, FilmListView, \
-    FilmDetailView, PurchaseCreateView, SessionUpdateView, HallUpdateView, CartListView
+    FilmDetailView, PurchaseCreateView, SessionUpdateView, HallUpdateView, CartListView, HoldConfirmView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -14,9 +15,12 @@ urlpatterns = [
     path('create_film', FilmCreateView.as_view(), name='create_film'),
     path('show_purchase/<int:pk>', FilmDetailView.as_view(), name='purchase_detail'),
     path('create_purchase/<int:session_id>', PurchaseCreateView.as_view(), name='purchase_create'),
+    path('hold/<int:pk>', HoldConfirmView.as_view(), name='hold_confirm'),
     path('update_session/<int:pk>', SessionUpdateView.as_view(), name='update_session'),
     path('update_hall/<int:pk>', HallUpdateView.as_view(), name='update_hall'),
     path('cart/', CartListView.as_view(), name='cart'),
     path('', FilmListView.as_view(), name='base'),
+    path('async/', async_views.schedule, name='async_base'),
+    path('async/show_purchase/<int:pk>', async_views.film_detail, name='async_purchase_detail'),
     path('', include('cinema_app.urls')),
 ]